@@ -0,0 +1,28 @@
+"""Add compound index for snapshot history
+
+Revision ID: 003
+Revises: 002
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Lets WHERE user_id = ? ORDER BY created_at DESC LIMIT n read rows in order
+    op.create_index(
+        'ix_snapshots_user_created',
+        'spending_snapshots',
+        ['user_id', sa.text('created_at DESC')]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_snapshots_user_created', table_name='spending_snapshots')
@@ -0,0 +1,37 @@
+"""Add persisted has_profile flag to user
+
+Revision ID: 004
+Revises: 003
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'users',
+        sa.Column('has_profile', sa.Boolean(), nullable=False, server_default=sa.false())
+    )
+
+    # Backfill from the existing profile fields
+    op.execute("""
+        UPDATE users
+        SET has_profile = true
+        WHERE age IS NOT NULL
+          AND gender IS NOT NULL
+          AND year_in_school IS NOT NULL
+          AND major IS NOT NULL
+          AND preferred_payment_method IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'has_profile')
@@ -0,0 +1,38 @@
+"""Store snapshot categorical codes as SMALLINT
+
+Revision ID: 005
+Revises: 004
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Small-range codes that don't need 4 bytes
+SMALL_COLUMNS = ('age', 'gender', 'year_in_school', 'major', 'preferred_payment_method')
+
+
+def upgrade() -> None:
+    for column in SMALL_COLUMNS:
+        op.alter_column(
+            'spending_snapshots', column,
+            type_=sa.SmallInteger(),
+            existing_type=sa.Integer(),
+            existing_nullable=False
+        )
+
+
+def downgrade() -> None:
+    for column in SMALL_COLUMNS:
+        op.alter_column(
+            'spending_snapshots', column,
+            type_=sa.Integer(),
+            existing_type=sa.SmallInteger(),
+            existing_nullable=False
+        )
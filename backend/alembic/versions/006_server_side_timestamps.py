@@ -0,0 +1,45 @@
+"""Generate timestamps on the database server
+
+Revision ID: 006
+Revises: 005
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Columns store naive UTC, so convert now() before it is cast to timestamp
+UTC_NOW = sa.text("timezone('utc', now())")
+
+TIMESTAMP_COLUMNS = (
+    ('users', 'created_at'),
+    ('users', 'updated_at'),
+    ('spending_snapshots', 'created_at'),
+    ('teacher_interactions', 'created_at'),
+)
+
+
+def upgrade() -> None:
+    for table, column in TIMESTAMP_COLUMNS:
+        op.alter_column(
+            table, column,
+            server_default=UTC_NOW,
+            existing_type=sa.DateTime(),
+            existing_nullable=False
+        )
+
+
+def downgrade() -> None:
+    for table, column in TIMESTAMP_COLUMNS:
+        op.alter_column(
+            table, column,
+            server_default=None,
+            existing_type=sa.DateTime(),
+            existing_nullable=False
+        )
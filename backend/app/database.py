@@ -1,26 +1,37 @@
-from sqlalchemy import create_engine
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from .config import get_settings
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.database_url,
+engine = create_async_engine(
+    settings.database_url.replace("postgresql://", "postgresql+asyncpg://", 1),
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+    connect_args={
+        # asyncpg's type-introspection queries trip the JIT on PG11+, which
+        # can add seconds to every new connection
+        "server_settings": {"jit": "off"},
+        # Set to 0 when running behind pgbouncer in transaction mode
+        "statement_cache_size": settings.db_statement_cache_size,
+    }
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
 
 Base = declarative_base()
 
 
-def get_db():
-    """Get database session."""
-    db = SessionLocal()
-    try:
+def utc_now():
+    """Server-side timestamp in UTC, matching the naive DateTime columns."""
+    return func.timezone("utc", func.now())
+
+
+async def get_db():
+    """Get async database session."""
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
@@ -1,16 +1,56 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import get_settings
+from .database import engine
 from .routes import auth, intake, dashboard, teacher, survey, debug, profile
+from .services import (
+    ClaudeParserService,
+    ClaudeSummarizerService,
+    ClaudeSurveyService,
+    ClaudeTeacherService,
+    SpendingRiskModelService,
+    AnalyticsService
+)
+from .services.anthropic_client import close_client, prewarm_prompt_cache
+from .services.claude_safety import start_audit_log, stop_audit_log
+from .services.claude_parser import PARSER_SYSTEM
+from .services.claude_summarizer import SUMMARIZER_SYSTEM
+from .utils.cache import ResponseCache
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared service instances once per process."""
+    start_audit_log()
+    app.state.cache = ResponseCache(settings.redis_url)
+    app.state.parser = ClaudeParserService(app.state.cache)
+    app.state.summarizer = ClaudeSummarizerService(app.state.cache)
+    app.state.ml = SpendingRiskModelService()
+    app.state.analytics = AnalyticsService()
+    app.state.survey = ClaudeSurveyService()
+    app.state.teacher = ClaudeTeacherService()
+    await app.state.ml.warmup()
+    app.state.ml.start_batching()
+    if settings.claude_prewarm:
+        await prewarm_prompt_cache(PARSER_SYSTEM, SUMMARIZER_SYSTEM)
+    yield
+    await app.state.ml.stop_batching()
+    await app.state.cache.close()
+    await close_client()
+    await engine.dispose()
+    stop_audit_log()
+
+
 app = FastAPI(
     title="HI FI Financial Literacy Guide API",
     description="API for student financial literacy guidance with ML risk prediction and AI teaching",
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
+    lifespan=lifespan,
 )
 
 # CORS middleware
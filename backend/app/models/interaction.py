@@ -1,14 +1,18 @@
 import uuid
-from datetime import datetime
-from sqlalchemy import Column, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Text, DateTime, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
-from ..database import Base
+from ..database import Base, utc_now
 
 
 class TeacherInteraction(Base):
     """Teacher interaction model for storing chat history."""
     __tablename__ = "teacher_interactions"
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        # Serves the per-user chat history scans without a sort
+        Index("ix_interactions_user_created", "user_id", text("created_at DESC")),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
@@ -19,7 +23,7 @@ class TeacherInteraction(Base):
     teacher_response = Column(JSONB, nullable=False)
 
     # Timestamp
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
 
     # Relationships
     user = relationship("User", back_populates="interactions")
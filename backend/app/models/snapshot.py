@@ -1,23 +1,28 @@
 import uuid
-from datetime import datetime
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, SmallInteger, Float, DateTime, ForeignKey, JSON, Index, text
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
-from ..database import Base
+from ..database import Base, utc_now
 
 
 class SpendingSnapshot(Base):
     """Spending snapshot model for storing ML input features and outputs."""
     __tablename__ = "spending_snapshots"
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        # Serves the per-user "latest first" history scans without a sort
+        Index("ix_snapshots_user_created", "user_id", text("created_at DESC")),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
 
-    # ML Input Features (all integers as per spec)
-    age = Column(Integer, nullable=False)
-    gender = Column(Integer, nullable=False)
-    year_in_school = Column(Integer, nullable=False)
-    major = Column(Integer, nullable=False)
+    # ML Input Features (all integers as per spec; small categorical codes as SMALLINT)
+    age = Column(SmallInteger, nullable=False)
+    gender = Column(SmallInteger, nullable=False)
+    year_in_school = Column(SmallInteger, nullable=False)
+    major = Column(SmallInteger, nullable=False)
     monthly_income = Column(Integer, nullable=False)
     financial_aid = Column(Integer, nullable=False)
     tuition = Column(Integer, nullable=False)
@@ -30,7 +35,7 @@ class SpendingSnapshot(Base):
     technology = Column(Integer, nullable=False)
     health_wellness = Column(Integer, nullable=False)
     miscellaneous = Column(Integer, nullable=False)
-    preferred_payment_method = Column(Integer, nullable=False)
+    preferred_payment_method = Column(SmallInteger, nullable=False)
 
     # ML Outputs
     overspending_prob = Column(Float, nullable=True)
@@ -40,7 +45,7 @@ class SpendingSnapshot(Base):
     summary = Column(JSON, nullable=True)
 
     # Timestamp
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
 
     # Relationships
     user = relationship("User", back_populates="snapshots")
@@ -71,13 +76,13 @@ class SpendingSnapshot(Base):
             "preferred_payment_method": self.preferred_payment_method,
         }
 
-    @property
-    def total_resources(self) -> [int]:
+    @hybrid_property
+    def total_resources(self) -> int:
         """Calculate total monthly resources (income + aid)."""
         return self.monthly_income + self.financial_aid
 
-    @property
-    def total_spending(self) -> [int]:
+    @hybrid_property
+    def total_spending(self) -> int:
         """Calculate total monthly spending."""
         return (
             self.tuition + self.housing + self.food + self.transportation +
@@ -85,7 +90,7 @@ class SpendingSnapshot(Base):
             self.technology + self.health_wellness + self.miscellaneous
         )
 
-    @property
-    def discretionary_spending(self) -> [int]:
+    @hybrid_property
+    def discretionary_spending(self) -> int:
         """Calculate discretionary spending (entertainment, personal care, misc)."""
         return self.entertainment + self.personal_care + self.miscellaneous
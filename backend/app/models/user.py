@@ -1,22 +1,23 @@
 import uuid
-from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Integer
+from sqlalchemy import Column, String, DateTime, Integer, Boolean, false
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from ..database import Base
+from ..database import Base, utc_now
 
 
 class User(Base):
     """Class for storing user information."""
     __tablename__ = "users"
+    # Read server-generated timestamps back via RETURNING
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     google_sub = Column(String(255), unique=True, nullable=False, index=True)
     email = Column(String(255), nullable=False)
     name = Column(String(255), nullable=True)
     picture = Column(String(500), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now(), nullable=False)
 
     # Profile fields (collected once during initial onboarding)
     age = Column(Integer, nullable=True)
@@ -25,14 +26,16 @@ class User(Base):
     major = Column(Integer, nullable=True)  # 0=STEM, 1=Business, etc.
     preferred_payment_method = Column(Integer, nullable=True)  # 0=Cash, 1=Credit, 2=Debit, 3=Mobile
 
+    # Whether all profile fields are set; kept in sync by update_profile_status()
+    has_profile = Column(Boolean, nullable=False, default=False, server_default=false())
+
     # Relationships
     snapshots = relationship("SpendingSnapshot", back_populates="user", cascade="all, delete-orphan")
     interactions = relationship("TeacherInteraction", back_populates="user", cascade="all, delete-orphan")
 
-    @property
-    def has_profile(self) -> bool:
-        """Check if user has completed their profile."""
-        return all([
+    def update_profile_status(self) -> None:
+        """Recompute has_profile after the profile fields change."""
+        self.has_profile = all([
             self.age is not None,
             self.gender is not None,
             self.year_in_school is not None,
@@ -1,8 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from google.oauth2 import id_token
-from google.auth.transport import requests
-from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, lambda_stmt, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
 from ..config import get_settings
@@ -13,19 +12,30 @@ from ..utils.auth import create_access_token
 router = APIRouter()
 settings = get_settings()
 
+# Compiled once and reused from SQLAlchemy's statement cache on every sign-in
+USER_BY_GOOGLE_SUB = lambda_stmt(
+    lambda: select(User).where(User.google_sub == bindparam("google_sub"))
+)
+
 
 @router.post("/google/callback", response_model=AuthResponse)
 async def google_auth_callback(
     auth_request: GoogleAuthRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Exchange Google ID token for app JWT.
     Creates user if first time, otherwise returns existing user.
     """
+    # google-auth is slow to import and only needed on sign-in
+    from google.oauth2 import id_token
+    from google.auth.transport import requests
+
     try:
-        # Verify the Google ID token
-        idinfo = id_token.verify_oauth2_token(
+        # Verify the Google ID token; this may fetch Google's certs over
+        # blocking HTTP, so keep it off the event loop
+        idinfo = await run_in_threadpool(
+            id_token.verify_oauth2_token,
             auth_request.credential,
             requests.Request(),
             settings.google_client_id
@@ -38,7 +48,8 @@ async def google_auth_callback(
         picture = idinfo.get("picture", "")
 
         # Check if user exists
-        user = db.query(User).filter(User.google_sub == google_sub).first()
+        result = await db.execute(USER_BY_GOOGLE_SUB, {"google_sub": google_sub})
+        user = result.scalar_one_or_none()
         is_new_user = False
 
         if not user:
@@ -50,8 +61,8 @@ async def google_auth_callback(
                 picture=picture
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
             is_new_user = True
         else:
             # Update user info if changed
@@ -59,9 +70,8 @@ async def google_auth_callback(
                 user.email = email
                 user.name = name
                 user.picture = picture
-                user.updated_at = datetime.utcnow()
-                db.commit()
-                db.refresh(user)
+                await db.commit()
+                await db.refresh(user)
 
         # Create JWT token
         access_token = create_access_token({"sub": str(user.id)})
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..config import get_settings
 from ..database import get_db
 from ..schemas.dashboard import (
     DashboardResponse,
@@ -13,15 +14,27 @@ from ..schemas.dashboard import (
 from ..models.user import User
 from ..models.snapshot import SpendingSnapshot
 from ..services import AnalyticsService
+from ..services.analytics import ANALYTICS_FIELDS
 from ..utils.auth import get_current_user
+from ..utils.cache import ResponseCache, dashboard_key
+from ..utils.services import get_analytics_service, get_response_cache
 
 router = APIRouter()
+settings = get_settings()
+
+# Shown until the summarizer has produced something for the latest snapshot
+_DEFAULT_SUMMARY = SummaryOutput.model_construct(
+    summary_paragraph="Your financial data is being analyzed.",
+    key_points=["Complete a check-in to get personalized insights."]
+)
 
 
 @router.get("/dashboard", response_model=DashboardResponse)
 async def get_dashboard(
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+    cache: ResponseCache = Depends(get_response_cache)
 ):
     """
     Get dashboard data for the current user.
@@ -32,28 +45,65 @@ async def get_dashboard(
     - Risk scores
     - Cached summary
     - Historical data for charts
+
+    With Redis configured, the rendered body is cached per user for a short
+    TTL and invalidated whenever the user's snapshots change. An in-process
+    cache can't be invalidated from other workers, so without Redis every
+    request is built fresh.
+    """
+    key = dashboard_key(user.id)
+    body = await cache.get(key) if cache.shared else None
+    if body is None:
+        dashboard = await _build_dashboard(user, db, analytics_service)
+        body = dashboard.model_dump_json(exclude_unset=True).encode()
+        if cache.shared:
+            await cache.set(key, body, settings.dashboard_cache_ttl)
+
+    return Response(content=body, media_type="application/json")
+
+
+async def _build_dashboard(
+    user: User,
+    db: AsyncSession,
+    analytics_service: AnalyticsService
+) -> DashboardResponse:
+    """
+    Query the user's snapshots and assemble the dashboard payload.
+
+    Everything here comes from our own database rows, so the models are
+    built with model_construct() and skip validation.
     """
-    # Get user's snapshots ordered by date
-    snapshots = (
-        db.query(SpendingSnapshot)
-        .filter(SpendingSnapshot.user_id == user.id)
+    # One narrow query for the last 10 snapshots. It carries every column
+    # the newest row needs (analytics inputs, breakdown, risk, summary);
+    # totals for the history are summed by Postgres via the hybrid properties
+    result = await db.execute(
+        select(
+            SpendingSnapshot.id,
+            SpendingSnapshot.created_at,
+            SpendingSnapshot.overspending_prob,
+            SpendingSnapshot.financial_stress_prob,
+            SpendingSnapshot.summary,
+            *(getattr(SpendingSnapshot, field) for field in ANALYTICS_FIELDS),
+            SpendingSnapshot.total_spending.label("total_spending"),
+            SpendingSnapshot.total_resources.label("total_resources")
+        )
+        .where(SpendingSnapshot.user_id == user.id)
         .order_by(desc(SpendingSnapshot.created_at))
         .limit(10)
-        .all()
     )
+    rows = result.all()
 
-    if not snapshots:
+    if not rows:
         # No data yet
-        return DashboardResponse(
+        return DashboardResponse.model_construct(
             user_id=user.id,
+            history=[],
             has_data=False
         )
-
-    # Latest snapshot
-    latest = snapshots[0]
+    latest = rows[0]
 
     # Build spending breakdown
-    spending_breakdown = SpendingBreakdown(
+    spending_breakdown = SpendingBreakdown.model_construct(
         tuition=latest.tuition,
         housing=latest.housing,
         food=latest.food,
@@ -67,7 +117,6 @@ async def get_dashboard(
     )
 
     # Compute analytics
-    analytics_service = AnalyticsService()
     analytics = analytics_service.compute(latest)
 
     # Risk scores
@@ -78,27 +127,24 @@ async def get_dashboard(
 
     # Get cached summary or create default
     if latest.summary:
-        summary = SummaryOutput(**latest.summary)
+        summary = SummaryOutput.model_construct(**latest.summary)
     else:
-        summary = SummaryOutput(
-            summary_paragraph="Your financial data is being analyzed.",
-            key_points=["Complete a check-in to get personalized insights."]
-        )
+        summary = _DEFAULT_SUMMARY
 
     # Build history for charts (reverse to chronological order)
     history = [
-        SnapshotHistory(
-            snapshot_id=s.id,
-            created_at=s.created_at,
-            overspending_prob=s.overspending_prob or 0,
-            financial_stress_prob=s.financial_stress_prob or 0,
-            total_spending=s.total_spending,
-            total_resources=s.total_resources
+        SnapshotHistory.model_construct(
+            snapshot_id=row.id,
+            created_at=row.created_at,
+            overspending_prob=row.overspending_prob or 0,
+            financial_stress_prob=row.financial_stress_prob or 0,
+            total_spending=row.total_spending,
+            total_resources=row.total_resources
         )
-        for s in reversed(snapshots)
+        for row in reversed(rows)
     ]
 
-    return DashboardResponse(
+    return DashboardResponse.model_construct(
         user_id=user.id,
         latest_snapshot_id=latest.id,
         spending_breakdown=spending_breakdown,
@@ -1,42 +1,49 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
 from ..models.user import User
-from ..models.snapshot import SpendingSnapshot
-from ..models.interaction import TeacherInteraction
 from ..utils.auth import get_current_user
+from ..utils.cache import ResponseCache, dashboard_key
+from ..utils.services import get_response_cache
 
 router = APIRouter()
 
+# Deletes interactions and snapshots and resets the profile in one round-trip.
+# FK checks fire at the end of the statement, so the order of the two
+# deletes doesn't matter.
+CLEAR_USER_DATA = text("""
+    WITH deleted_interactions AS (
+        DELETE FROM teacher_interactions WHERE user_id = :user_id
+    ), deleted_snapshots AS (
+        DELETE FROM spending_snapshots WHERE user_id = :user_id
+    )
+    UPDATE users
+    SET age = NULL,
+        gender = NULL,
+        year_in_school = NULL,
+        major = NULL,
+        preferred_payment_method = NULL,
+        has_profile = false,
+        updated_at = timezone('utc', now())
+    WHERE id = :user_id
+""")
+
 
 @router.delete("/clear-user-data")
 async def clear_user_data(
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    cache: ResponseCache = Depends(get_response_cache)
 ):
     """
     Clear all data for the current user (snapshots and interactions).
     For development/testing purposes only.
     """
-    # Delete interactions first (FK constraint)
-    db.query(TeacherInteraction).filter(
-        TeacherInteraction.user_id == user.id
-    ).delete()
-
-    # Delete snapshots
-    db.query(SpendingSnapshot).filter(
-        SpendingSnapshot.user_id == user.id
-    ).delete()
-
-    # Reset user profile fields so onboarding starts fresh
-    user.age = None
-    user.gender = None
-    user.year_in_school = None
-    user.major = None
-    user.preferred_payment_method = None
-
-    db.commit()
+    await db.execute(CLEAR_USER_DATA, {"user_id": user.id})
+    await db.commit()
+    await cache.delete(dashboard_key(user.id))
 
     return {
         "message": "User data cleared successfully",
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
 from ..schemas.intake import IntakeRequest, IntakeResponse, SnapshotData
@@ -14,15 +14,28 @@ from ..services import (
     AnalyticsService
 )
 from ..utils.auth import get_current_user
+from ..utils.cache import ResponseCache, dashboard_key
+from ..utils.services import (
+    get_parser_service,
+    get_summarizer_service,
+    get_ml_service,
+    get_analytics_service,
+    get_response_cache
+)
 
 router = APIRouter()
 
 
-@router.post("/intake", response_model=IntakeResponse)
+@router.post("/intake", response_model=IntakeResponse, response_model_exclude_unset=True)
 async def submit_intake(
     intake: IntakeRequest,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    parser_service: ClaudeParserService = Depends(get_parser_service),
+    ml_service: SpendingRiskModelService = Depends(get_ml_service),
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+    summarizer_service: ClaudeSummarizerService = Depends(get_summarizer_service),
+    cache: ResponseCache = Depends(get_response_cache)
 ):
     """
     Process intake form (onboarding or check-in).
@@ -37,22 +50,16 @@ async def submit_intake(
     7. Generate summary using Claude summarizer
     8. Return complete response
     """
-    # Initialize services
-    parser_service = ClaudeParserService()
-    ml_service = SpendingRiskModelService()
-    analytics_service = AnalyticsService()
-    summarizer_service = ClaudeSummarizerService()
-
     try:
         # Step 1: Parse raw answers into structured snapshot
         # Pass user for profile data (used in check-ins)
         snapshot_data = await parser_service.parse(intake.raw_answers, user)
 
         # Step 2: Create ML input and run prediction
-        ml_input = MLInput(**snapshot_data.model_dump())
+        ml_input = MLInput.from_snapshot(snapshot_data)
         ml_output = await ml_service.predict(ml_input)
 
-        # Step 3: Compute analytics
+        # Step 3: Compute analytics (memoized arithmetic, nothing to overlap)
         analytics = analytics_service.compute(snapshot_data)
 
         # Step 4: Generate summary
@@ -70,12 +77,13 @@ async def submit_intake(
         )
         db.add(snapshot)
         # Commit both snapshot and any user profile changes from parser
-        db.commit()
-        db.refresh(snapshot)
-        db.refresh(user)  # Ensure user profile changes are persisted
+        await db.commit()
+        await db.refresh(snapshot)
+        await cache.delete(dashboard_key(user.id))
 
         # Step 6: Return response
-        return IntakeResponse(
+        # Every field is already validated or comes from the DB row
+        return IntakeResponse.model_construct(
             snapshot_id=snapshot.id,
             overspending_prob=ml_output.overspending_prob,
             financial_stress_prob=ml_output.financial_stress_prob,
@@ -90,7 +98,7 @@ async def submit_intake(
             detail=f"Failed to parse intake data: {str(e)}"
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process intake: {str(e)}"
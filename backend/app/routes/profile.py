@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
 from ..schemas.profile import ProfileData, ProfileResponse
@@ -12,7 +12,7 @@ router = APIRouter()
 @router.get("/profile", response_model=ProfileResponse)
 async def get_profile(
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get user's profile data."""
     return ProfileResponse(
@@ -29,7 +29,7 @@ async def get_profile(
 async def update_profile(
     profile: ProfileData,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update user's profile data."""
     if profile.age is not None:
@@ -42,9 +42,10 @@ async def update_profile(
         user.major = profile.major
     if profile.preferred_payment_method is not None:
         user.preferred_payment_method = profile.preferred_payment_method
+    user.update_profile_status()
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return ProfileResponse(
         age=user.age,
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends
-from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
 from ..models.user import User
 from ..services.claude_survey import ClaudeSurveyService
 from ..utils.auth import get_current_user
+from ..utils.services import get_survey_service
 
 router = APIRouter()
 
@@ -16,9 +17,13 @@ class ConversationMessage(BaseModel):
     field: str | None = None
 
 
+# Dumps the whole conversation in one pydantic-core call
+_conversation_adapter = TypeAdapter(list[ConversationMessage])
+
+
 class NextQuestionRequest(BaseModel):
     conversation: list[ConversationMessage]
-    collected_fields: list[str]
+    collected_fields: set[str]
 
 
 class NextQuestionResponse(BaseModel):
@@ -35,17 +40,16 @@ class NextQuestionResponse(BaseModel):
 async def get_next_question(
     request: NextQuestionRequest,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    survey_service: ClaudeSurveyService = Depends(get_survey_service)
 ):
     """
     Get the next survey question based on conversation history.
     Uses Claude to generate adaptive, conversational questions.
     For check-ins (users with profile), skips profile fields.
     """
-    survey_service = ClaudeSurveyService()
-
     result = await survey_service.generate_next_question(
-        conversation_history=[msg.model_dump() for msg in request.conversation],
+        conversation_history=_conversation_adapter.dump_python(request.conversation),
         collected_fields=request.collected_fields,
         has_profile=user.has_profile
     )
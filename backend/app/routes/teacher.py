@@ -1,62 +1,90 @@
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi.responses import StreamingResponse
+from sqlalchemy import desc, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from typing import Optional
-from datetime import date
 
-from ..database import get_db
+from ..database import get_db, utc_now
 from ..schemas.teacher import (
     TeacherChatRequest,
     TeacherChatResponse,
     ChatHistoryResponse,
-    ChatHistory
+    ChatHistory,
+    TeacherOutput
 )
 from ..schemas.intake import SnapshotData
-from ..schemas.ml import MLInput, MLOutput
+from ..schemas.ml import ML_INPUT_FIELDS, MLInput, MLOutput
 from ..models.user import User
 from ..models.snapshot import SpendingSnapshot
 from ..models.interaction import TeacherInteraction
 from ..services import ClaudeTeacherService, AnalyticsService, SpendingRiskModelService, ClaudeSummarizerService
 from ..utils.auth import get_current_user
+from ..utils.cache import ResponseCache, dashboard_key
+from ..utils.services import (
+    get_teacher_service,
+    get_summarizer_service,
+    get_ml_service,
+    get_analytics_service,
+    get_response_cache
+)
 
 router = APIRouter()
 
+# Columns the chat turn reads from a snapshot; plain rows skip ORM hydration
+_SNAPSHOT_COLUMNS = (
+    SpendingSnapshot.id,
+    SpendingSnapshot.created_at,
+    SpendingSnapshot.overspending_prob,
+    SpendingSnapshot.financial_stress_prob,
+    *(getattr(SpendingSnapshot, name) for name in ML_INPUT_FIELDS),
+)
 
-@router.post("/chat", response_model=TeacherChatResponse)
-async def teacher_chat(
+# Fields the teacher is allowed to update
+_SNAPSHOT_FIELDS = frozenset(SnapshotData.model_fields)
+
+
+async def _load_turn(
     request: TeacherChatRequest,
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user: User,
+    db: AsyncSession,
+    analytics_service: AnalyticsService
 ):
     """
-    Send a message to the teacher agent and get a response.
+    Load the snapshot a chat turn is about and build the teacher's inputs.
 
-    Uses the latest snapshot (or specified snapshot) to provide
-    context-aware financial guidance.
+    Returns the snapshot row and the keyword arguments for the teacher service.
     """
-    # Get the relevant snapshot
+    # Fetch the relevant snapshot and the one before it in a single query
+    query = (
+        select(*_SNAPSHOT_COLUMNS)
+        .where(SpendingSnapshot.user_id == user.id)
+        .order_by(desc(SpendingSnapshot.created_at))
+        .limit(2)
+    )
     if request.snapshot_id:
-        snapshot = (
-            db.query(SpendingSnapshot)
-            .filter(
+        # Anchor on the requested snapshot; on timestamp ties keep it first
+        anchor = (
+            select(SpendingSnapshot.created_at)
+            .where(
                 SpendingSnapshot.id == request.snapshot_id,
                 SpendingSnapshot.user_id == user.id
             )
-            .first()
+            .scalar_subquery()
         )
-        if not snapshot:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Snapshot not found"
-            )
-    else:
-        # Get latest snapshot
-        snapshot = (
-            db.query(SpendingSnapshot)
-            .filter(SpendingSnapshot.user_id == user.id)
-            .order_by(desc(SpendingSnapshot.created_at))
-            .first()
+        query = (
+            query.where(SpendingSnapshot.created_at <= anchor)
+            .order_by(desc(SpendingSnapshot.id == request.snapshot_id))
+        )
+    result = await db.execute(query)
+    rows = result.all()
+    snapshot, previous_snapshot = (list(rows) + [None, None])[:2]
+
+    if request.snapshot_id and not snapshot:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Snapshot not found"
         )
 
     if not snapshot:
@@ -65,41 +93,8 @@ async def teacher_chat(
             detail="No spending data available. Please complete onboarding first."
         )
 
-    # Get previous snapshot for comparison (if exists)
-    previous_snapshot = (
-        db.query(SpendingSnapshot)
-        .filter(
-            SpendingSnapshot.user_id == user.id,
-            SpendingSnapshot.created_at < snapshot.created_at
-        )
-        .order_by(desc(SpendingSnapshot.created_at))
-        .first()
-    )
-
-    # Initialize services
-    teacher_service = ClaudeTeacherService()
-    analytics_service = AnalyticsService()
-
     # Convert snapshot to Pydantic model
-    snapshot_data = SnapshotData(
-        age=snapshot.age,
-        gender=snapshot.gender,
-        year_in_school=snapshot.year_in_school,
-        major=snapshot.major,
-        monthly_income=snapshot.monthly_income,
-        financial_aid=snapshot.financial_aid,
-        tuition=snapshot.tuition,
-        housing=snapshot.housing,
-        food=snapshot.food,
-        transportation=snapshot.transportation,
-        books_supplies=snapshot.books_supplies,
-        entertainment=snapshot.entertainment,
-        personal_care=snapshot.personal_care,
-        technology=snapshot.technology,
-        health_wellness=snapshot.health_wellness,
-        miscellaneous=snapshot.miscellaneous,
-        preferred_payment_method=snapshot.preferred_payment_method
-    )
+    snapshot_data = SnapshotData.model_validate(snapshot)
 
     # Get ML outputs
     ml_output = MLOutput(
@@ -114,29 +109,10 @@ async def teacher_chat(
     previous_data = None
     previous_analytics = None
     if previous_snapshot:
-        previous_data = SnapshotData(
-            age=previous_snapshot.age,
-            gender=previous_snapshot.gender,
-            year_in_school=previous_snapshot.year_in_school,
-            major=previous_snapshot.major,
-            monthly_income=previous_snapshot.monthly_income,
-            financial_aid=previous_snapshot.financial_aid,
-            tuition=previous_snapshot.tuition,
-            housing=previous_snapshot.housing,
-            food=previous_snapshot.food,
-            transportation=previous_snapshot.transportation,
-            books_supplies=previous_snapshot.books_supplies,
-            entertainment=previous_snapshot.entertainment,
-            personal_care=previous_snapshot.personal_care,
-            technology=previous_snapshot.technology,
-            health_wellness=previous_snapshot.health_wellness,
-            miscellaneous=previous_snapshot.miscellaneous,
-            preferred_payment_method=previous_snapshot.preferred_payment_method
-        )
+        previous_data = SnapshotData.model_validate(previous_snapshot)
         previous_analytics = analytics_service.compute(previous_data)
 
-    # Generate teacher response
-    teacher_output = await teacher_service.generate_response(
+    return snapshot, dict(
         snapshot=snapshot_data,
         ml_output=ml_output,
         analytics=analytics,
@@ -145,70 +121,94 @@ async def teacher_chat(
         previous_analytics=previous_analytics
     )
 
-    # Process field updates if any were detected
-    if teacher_output.field_updates:
+
+async def _record_turn(
+    request: TeacherChatRequest,
+    user: User,
+    db: AsyncSession,
+    snapshot,
+    snapshot_data: SnapshotData,
+    teacher_output: TeacherOutput,
+    ml_service: SpendingRiskModelService,
+    analytics_service: AnalyticsService,
+    summarizer_service: ClaudeSummarizerService,
+    cache: ResponseCache
+) -> TeacherChatResponse:
+    """Apply any field updates from the teacher's reply and save the interaction."""
+    # Keep only detected updates that actually change a value, so
+    # confirmation turns skip the ML/summarizer/write path entirely
+    updates = {
+        u.field: int(u.value)
+        for u in teacher_output.field_updates
+        if u.field in _SNAPSHOT_FIELDS and int(u.value) != getattr(snapshot_data, u.field)
+    }
+
+    snapshot_id = snapshot.id
+    if updates:
         # Create updated snapshot data
         updated_data = snapshot_data.model_dump()
-        for update in teacher_output.field_updates:
-            if update.field in updated_data:
-                updated_data[update.field] = int(update.value)
+        updated_data.update(updates)
 
-        # Create new snapshot with updates
+        # Validate the updated values; updated_data is reused below for the
+        # snapshot write instead of dumping new_snapshot_data again
         new_snapshot_data = SnapshotData(**updated_data)
 
-        # Run ML prediction
-        ml_service = SpendingRiskModelService()
-        ml_input = MLInput(**new_snapshot_data.model_dump())
+        # Run ML prediction, then compute new analytics (memoized arithmetic)
+        ml_input = MLInput.from_snapshot(new_snapshot_data)
         new_ml_output = await ml_service.predict(ml_input)
-
-        # Compute new analytics
         new_analytics = analytics_service.compute(new_snapshot_data)
 
         # Generate new summary
-        summarizer_service = ClaudeSummarizerService()
         new_summary = await summarizer_service.summarize(
             new_snapshot_data, new_ml_output, new_analytics
         )
 
-        # Check if current snapshot was created today - if so, update it instead of creating new
-        snapshot_date = snapshot.created_at.date()
-        today = date.today()
-
-        if snapshot_date == today:
-            # Update existing snapshot
-            for key, value in new_snapshot_data.model_dump().items():
-                setattr(snapshot, key, value)
-            snapshot.overspending_prob = new_ml_output.overspending_prob
-            snapshot.financial_stress_prob = new_ml_output.financial_stress_prob
-            snapshot.summary = new_summary.model_dump()
-            db.commit()
-            db.refresh(snapshot)
-        else:
-            # Create new snapshot for new day/month
-            new_snapshot = SpendingSnapshot(
-                user_id=user.id,
-                **new_snapshot_data.model_dump(),
-                overspending_prob=new_ml_output.overspending_prob,
-                financial_stress_prob=new_ml_output.financial_stress_prob,
-                summary=new_summary.model_dump()
+        new_values = dict(
+            **updated_data,
+            overspending_prob=new_ml_output.overspending_prob,
+            financial_stress_prob=new_ml_output.financial_stress_prob,
+            summary=new_summary.model_dump()
+        )
+
+        # Update the current snapshot in place if it was created today (UTC);
+        # Postgres makes the call so there's no separate date check in Python
+        result = await db.execute(
+            update(SpendingSnapshot)
+            .where(
+                SpendingSnapshot.id == snapshot.id,
+                SpendingSnapshot.created_at >= func.date_trunc("day", utc_now())
             )
-            db.add(new_snapshot)
-            db.commit()
-            db.refresh(new_snapshot)
+            .values(**new_values)
+            .returning(SpendingSnapshot.id)
+        )
+        updated_id = result.scalar_one_or_none()
 
-            # Use the new snapshot for the interaction
-            snapshot = new_snapshot
+        if updated_id is None:
+            # Create new snapshot for new day/month; RETURNING hands back
+            # the id the interaction below points at
+            result = await db.execute(
+                insert(SpendingSnapshot)
+                .values(user_id=user.id, **new_values)
+                .returning(SpendingSnapshot.id)
+            )
+            snapshot_id = result.scalar_one()
 
-    # Save interaction
-    interaction = TeacherInteraction(
-        user_id=user.id,
-        snapshot_id=snapshot.id,
-        user_message=request.user_message,
-        teacher_response=teacher_output.model_dump()
+    # Save interaction (committed together with any snapshot change)
+    result = await db.execute(
+        insert(TeacherInteraction)
+        .values(
+            user_id=user.id,
+            snapshot_id=snapshot_id,
+            user_message=request.user_message,
+            teacher_response=teacher_output.model_dump()
+        )
+        .returning(TeacherInteraction.id, TeacherInteraction.created_at)
     )
-    db.add(interaction)
-    db.commit()
-    db.refresh(interaction)
+    interaction = result.one()
+    await db.commit()
+
+    if updates:
+        await cache.delete(dashboard_key(user.id))
 
     return TeacherChatResponse(
         interaction_id=interaction.id,
@@ -217,31 +217,109 @@ async def teacher_chat(
     )
 
 
+@router.post("/chat", response_model=TeacherChatResponse)
+async def teacher_chat(
+    request: TeacherChatRequest,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    teacher_service: ClaudeTeacherService = Depends(get_teacher_service),
+    ml_service: SpendingRiskModelService = Depends(get_ml_service),
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+    summarizer_service: ClaudeSummarizerService = Depends(get_summarizer_service),
+    cache: ResponseCache = Depends(get_response_cache)
+):
+    """
+    Send a message to the teacher agent and get a response.
+
+    Uses the latest snapshot (or specified snapshot) to provide
+    context-aware financial guidance.
+    """
+    snapshot, inputs = await _load_turn(request, user, db, analytics_service)
+
+    # Generate teacher response
+    teacher_output = await teacher_service.generate_response(**inputs)
+
+    return await _record_turn(
+        request, user, db, snapshot, inputs["snapshot"], teacher_output,
+        ml_service, analytics_service, summarizer_service, cache
+    )
+
+
+@router.post("/chat/stream")
+async def teacher_chat_stream(
+    request: TeacherChatRequest,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    teacher_service: ClaudeTeacherService = Depends(get_teacher_service),
+    ml_service: SpendingRiskModelService = Depends(get_ml_service),
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+    summarizer_service: ClaudeSummarizerService = Depends(get_summarizer_service),
+    cache: ResponseCache = Depends(get_response_cache)
+):
+    """
+    Same as /chat, but streams the reply as server-sent events.
+
+    The coaching explanation arrives as plain-text `data: {"delta": ...}`
+    frames while Claude is still writing; the other reply fields are only
+    sent at the end. A final `event: done` frame carries the full
+    TeacherChatResponse once the reply has been validated and saved.
+    """
+    # Load before streaming starts so a missing snapshot is still a 404/400
+    snapshot, inputs = await _load_turn(request, user, db, analytics_service)
+
+    async def events():
+        teacher_output = None
+        async for kind, payload in teacher_service.generate_response_stream(**inputs):
+            if kind == "delta":
+                yield f"data: {orjson.dumps({'delta': payload}).decode()}\n\n"
+            else:
+                teacher_output = payload
+
+        response = await _record_turn(
+            request, user, db, snapshot, inputs["snapshot"], teacher_output,
+            ml_service, analytics_service, summarizer_service, cache
+        )
+        yield f"event: done\ndata: {response.model_dump_json()}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/history", response_model=ChatHistoryResponse)
 async def get_chat_history(
     limit: int = 20,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get the user's chat history with the teacher."""
-    interactions = (
-        db.query(TeacherInteraction)
-        .filter(TeacherInteraction.user_id == user.id)
+    # Newest `limit` rows, handed back oldest-first by Postgres
+    latest = (
+        select(
+            TeacherInteraction.id,
+            TeacherInteraction.user_message,
+            TeacherInteraction.teacher_response,
+            TeacherInteraction.created_at
+        )
+        .where(TeacherInteraction.user_id == user.id)
         .order_by(desc(TeacherInteraction.created_at))
         .limit(limit)
-        .all()
+        .subquery()
     )
+    result = await db.execute(select(latest).order_by(latest.c.created_at))
 
-    from ..schemas.teacher import TeacherOutput
-
+    # Stored responses were validated when written; only the nested JSON
+    # needs parsing back into models, the wrappers are constructed directly
     history = [
-        ChatHistory(
+        ChatHistory.model_construct(
             interaction_id=i.id,
             user_message=i.user_message,
-            teacher_response=TeacherOutput(**i.teacher_response),
+            teacher_response=TeacherOutput.model_validate(i.teacher_response),
             created_at=i.created_at
         )
-        for i in reversed(interactions)
+        for i in result
     ]
 
-    return ChatHistoryResponse(history=history)
+    return ChatHistoryResponse.model_construct(history=history)
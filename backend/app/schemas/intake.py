@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from uuid import UUID
 from datetime import datetime
 
@@ -18,6 +18,8 @@ class IntakeRequest(BaseModel):
 
 class SnapshotData(BaseModel):
     """Structured snapshot data matching ML input schema."""
+    model_config = ConfigDict(from_attributes=True)
+
     age: int = Field(..., ge=16, le=100)
     gender: int = Field(..., ge=0, le=3)
     year_in_school: int = Field(..., ge=0, le=4)
@@ -1,5 +1,26 @@
 from pydantic import BaseModel, Field
 
+# Feature names shared by MLInput, SnapshotData and SpendingSnapshot
+ML_INPUT_FIELDS = (
+    "age",
+    "gender",
+    "year_in_school",
+    "major",
+    "monthly_income",
+    "financial_aid",
+    "tuition",
+    "housing",
+    "food",
+    "transportation",
+    "books_supplies",
+    "entertainment",
+    "personal_care",
+    "technology",
+    "health_wellness",
+    "miscellaneous",
+    "preferred_payment_method",
+)
+
 
 class MLInput(BaseModel):
     """Input schema for ML model prediction."""
@@ -21,6 +42,14 @@ class MLInput(BaseModel):
     miscellaneous: int
     preferred_payment_method: int
 
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "MLInput":
+        """
+        Build from an already-validated SnapshotData or a SpendingSnapshot row.
+        Skips validation since both sources are trusted integers.
+        """
+        return cls.model_construct(**{name: getattr(snapshot, name) for name in ML_INPUT_FIELDS})
+
 
 class MLOutput(BaseModel):
     """Output schema from ML model prediction."""
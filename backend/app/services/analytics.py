@@ -1,78 +1,101 @@
+from functools import lru_cache
+from operator import attrgetter
+
 from ..schemas.intake import SnapshotData
 from ..schemas.dashboard import Analytics
 from ..models.snapshot import SpendingSnapshot
 
+# Snapshot fields the analytics depend on, in _compute_analytics argument order
+ANALYTICS_FIELDS = (
+    "monthly_income",
+    "financial_aid",
+    "tuition",
+    "housing",
+    "food",
+    "transportation",
+    "books_supplies",
+    "entertainment",
+    "personal_care",
+    "technology",
+    "health_wellness",
+    "miscellaneous",
+)
 
-class AnalyticsService:
-    """Service for computing analytics from spending snapshots."""
+# Fetches all of the above as a tuple in one C-level call
+_get_analytics_fields = attrgetter(*ANALYTICS_FIELDS)
 
-    def compute(self, snapshot: SnapshotData | SpendingSnapshot) -> Analytics:
-        """Compute analytics from a snapshot."""
-        # Handle both Pydantic model and SQLAlchemy model
-        if isinstance(snapshot, SpendingSnapshot):
-            data = {
-                "monthly_income": snapshot.monthly_income,
-                "financial_aid": snapshot.financial_aid,
-                "tuition": snapshot.tuition,
-                "housing": snapshot.housing,
-                "food": snapshot.food,
-                "transportation": snapshot.transportation,
-                "books_supplies": snapshot.books_supplies,
-                "entertainment": snapshot.entertainment,
-                "personal_care": snapshot.personal_care,
-                "technology": snapshot.technology,
-                "health_wellness": snapshot.health_wellness,
-                "miscellaneous": snapshot.miscellaneous,
-            }
-        else:
-            data = snapshot.model_dump()
 
-        total_resources = data["monthly_income"] + data["financial_aid"]
-        total_spending = (
-            data["tuition"] + data["housing"] + data["food"] +
-            data["transportation"] + data["books_supplies"] +
-            data["entertainment"] + data["personal_care"] +
-            data["technology"] + data["health_wellness"] +
-            data["miscellaneous"]
-        )
+@lru_cache(maxsize=1024)
+def _compute_analytics(
+    monthly_income: int,
+    financial_aid: int,
+    tuition: int,
+    housing: int,
+    food: int,
+    transportation: int,
+    books_supplies: int,
+    entertainment: int,
+    personal_care: int,
+    technology: int,
+    health_wellness: int,
+    miscellaneous: int
+) -> Analytics:
+    """
+    Pure arithmetic behind AnalyticsService.compute, memoized on the inputs.
+    The returned model is shared between callers and must not be mutated.
+    """
+    total_resources = monthly_income + financial_aid
+    total_spending = (
+        tuition + housing + food +
+        transportation + books_supplies +
+        entertainment + personal_care +
+        technology + health_wellness +
+        miscellaneous
+    )
+
+    discretionary = entertainment + personal_care + miscellaneous
 
-        discretionary = (
-            data["entertainment"] + data["personal_care"] +
-            data["miscellaneous"]
-        )
+    # Calculate shares (avoid division by zero)
+    if total_resources > 0:
+        food_share = round(food / total_resources, 3)
+        housing_share = round(housing / total_resources, 3)
+        entertainment_share = round(entertainment / total_resources, 3)
+        discretionary_share = round(discretionary / total_resources, 3)
+        tuition_share = round(tuition / total_resources, 3)
+    else:
+        food_share = 0.0
+        housing_share = 0.0
+        entertainment_share = 0.0
+        discretionary_share = 0.0
+        tuition_share = 0.0
 
-        # Calculate shares (avoid division by zero)
-        if total_resources > 0:
-            food_share = round(data["food"] / total_resources, 3)
-            housing_share = round(data["housing"] / total_resources, 3)
-            entertainment_share = round(data["entertainment"] / total_resources, 3)
-            discretionary_share = round(discretionary / total_resources, 3)
-            tuition_share = round(data["tuition"] / total_resources, 3)
-        else:
-            food_share = 0.0
-            housing_share = 0.0
-            entertainment_share = 0.0
-            discretionary_share = 0.0
-            tuition_share = 0.0
+    net_balance = total_resources - total_spending
+    is_overspending = net_balance < 0
+    overspending_amount = abs(net_balance) if is_overspending else 0
+    savings_potential = net_balance if net_balance > 0 else 0
 
-        net_balance = total_resources - total_spending
-        is_overspending = net_balance < 0
-        overspending_amount = abs(net_balance) if is_overspending else 0
-        savings_potential = net_balance if net_balance > 0 else 0
+    return Analytics(
+        total_resources=total_resources,
+        total_spending=total_spending,
+        net_balance=net_balance,
+        is_overspending=is_overspending,
+        overspending_amount=overspending_amount,
+        savings_potential=savings_potential,
+        food_share=food_share,
+        housing_share=housing_share,
+        entertainment_share=entertainment_share,
+        discretionary_share=discretionary_share,
+        tuition_share=tuition_share
+    )
 
-        return Analytics(
-            total_resources=total_resources,
-            total_spending=total_spending,
-            net_balance=net_balance,
-            is_overspending=is_overspending,
-            overspending_amount=overspending_amount,
-            savings_potential=savings_potential,
-            food_share=food_share,
-            housing_share=housing_share,
-            entertainment_share=entertainment_share,
-            discretionary_share=discretionary_share,
-            tuition_share=tuition_share
-        )
+
+class AnalyticsService:
+    """Service for computing analytics from spending snapshots."""
+
+    def compute(self, snapshot: SnapshotData | SpendingSnapshot) -> Analytics:
+        """Compute analytics from a snapshot."""
+        # Works for both the Pydantic and SQLAlchemy models
+        return _compute_analytics(*_get_analytics_fields(snapshot))
 
     def compute_deltas(
         self,
@@ -0,0 +1,99 @@
+"""
+Shared Anthropic client for the Claude-backed services.
+
+Every service reuses one AsyncAnthropic instance (and so one connection
+pool). Calls go through `async with claude_rate_limiter, claude_semaphore:`
+so they are throttled before the API has to answer with 429s: the limiter
+spaces out request starts and the semaphore caps how many are in flight.
+Both are per process, so the configured account-wide limits are split
+evenly between the WEB_CONCURRENCY workers.
+"""
+import asyncio
+import logging
+
+from aiolimiter import AsyncLimiter
+
+from ..config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_workers = max(1, settings.web_concurrency)
+claude_semaphore = asyncio.Semaphore(max(1, settings.anthropic_max_concurrency // _workers))
+claude_rate_limiter = AsyncLimiter(settings.anthropic_requests_per_minute / _workers, 60)
+
+_client = None
+
+
+def cached_system(text: str) -> list[dict]:
+    """Wrap a static system prompt as a prompt-cacheable system block."""
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+
+def log_cache_usage(service_name: str, message) -> None:
+    """Log the prompt-cache reads/writes the API reports for a response."""
+    usage = message.usage
+    logger.info(
+        "[%s] prompt cache read=%s created=%s",
+        service_name,
+        getattr(usage, "cache_read_input_tokens", None),
+        getattr(usage, "cache_creation_input_tokens", None),
+    )
+
+
+def get_client():
+    """Return the shared AsyncAnthropic client, or None if no API key is set."""
+    global _client
+    if _client is None and settings.anthropic_api_key:
+        # The SDK takes most of a second to import; only pay for it when used
+        import httpx
+        from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient, Timeout
+        _client = AsyncAnthropic(
+            api_key=settings.anthropic_api_key,
+            # HTTP/2 lets concurrent requests multiplex over one TLS
+            # connection instead of opening one each
+            http_client=DefaultAsyncHttpxClient(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=settings.anthropic_max_connections,
+                    max_keepalive_connections=settings.anthropic_max_connections,
+                    keepalive_expiry=60.0
+                )
+            ),
+            timeout=Timeout(settings.anthropic_timeout, connect=5.0, pool=5.0)
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared client's connection pool."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def prewarm_prompt_cache(*systems: str) -> None:
+    """
+    Prime the API-side prompt cache with each static system prompt.
+
+    Costs one tiny request per prompt, so it's only done when enabled.
+    """
+    client = get_client()
+    if client is None:
+        return
+
+    async def ping(system: str) -> None:
+        try:
+            async with claude_rate_limiter, claude_semaphore:
+                message = await client.messages.create(
+                    model="claude-sonnet-4-20250514",
+                    max_tokens=1,
+                    system=cached_system(system),
+                    messages=[{"role": "user", "content": "ping"}]
+                )
+            log_cache_usage("prewarm", message)
+        except Exception as e:
+            logger.warning(f"Prompt cache prewarm failed: {e}")
+
+    await asyncio.gather(*(ping(system) for system in systems))
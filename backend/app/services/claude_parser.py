@@ -1,11 +1,81 @@
-import json
-import anthropic
+import re
+import orjson
 from ..schemas.intake import RawAnswer, SnapshotData
 from ..models.user import User
 from ..config import get_settings
+from ..utils.enums import GENDER_LABELS, YEAR_LABELS, MAJOR_LABELS, PAYMENT_METHOD_LABELS
+from ..utils.cache import CLAUDE_RESULT_TTL, ResponseCache, parser_key
+from .claude_safety import validate_financial_data, extract_json
+from .claude_survey import PROFILE_FIELDS, FINANCIAL_FIELDS, REQUIRED_FIELDS
+from .anthropic_client import get_client, claude_rate_limiter, claude_semaphore, cached_system, log_cache_usage
 
 settings = get_settings()
 
+# Static part of the parser prompt. It goes out as a cached system block so
+# only the user's answers are processed fresh on each call.
+PARSER_SYSTEM = """You are a financial data parser. Your job is to extract structured financial information from conversational survey answers.
+
+Parse the survey answers you are given into structured financial data. Extract the values and convert them to the specified formats.
+
+Return a JSON object with these exact fields (use the integer codes specified):
+
+- age: integer (16-100)
+- gender: integer (0=Male, 1=Female, 2=Non-binary, 3=Prefer not to say)
+- year_in_school: integer (0=Freshman, 1=Sophomore, 2=Junior, 3=Senior, 4=Graduate)
+- major: integer - Map the field of study to one of these categories:
+  0=STEM (includes CS, computer science, engineering, math, physics, chemistry, biology, data science, etc.)
+  1=Business (includes finance, accounting, marketing, economics, MBA, etc.)
+  2=Humanities (includes english, history, philosophy, languages, literature, etc.)
+  3=Social Sciences (includes psychology, sociology, political science, anthropology, etc.)
+  4=Arts (includes art, music, theater, design, film, etc.)
+  5=Health Sciences (includes nursing, pre-med, public health, kinesiology, etc.)
+  6=Education
+  7=Law/Pre-Law
+  8=Other
+- monthly_income: integer in dollars (total monthly income, extract number, default 0)
+- financial_aid: integer in dollars (monthly financial aid amount, extract number, default 0)
+- tuition: integer in dollars (monthly tuition cost, extract number, default 0)
+- housing: integer in dollars (monthly housing cost, extract number, default 0)
+- food: integer in dollars (monthly food spending, extract number, default 0)
+- transportation: integer in dollars (monthly transportation cost, extract number, default 0)
+- books_supplies: integer in dollars (monthly books and supplies cost, extract number, default 0)
+- entertainment: integer in dollars (monthly entertainment spending, extract number, default 0)
+- personal_care: integer in dollars (monthly personal care spending, extract number, default 0)
+- technology: integer in dollars (monthly technology spending, extract number, default 0)
+- health_wellness: integer in dollars (monthly health and wellness spending, extract number, default 0)
+- miscellaneous: integer in dollars (monthly miscellaneous spending, extract number, default 0)
+- preferred_payment_method: integer (0=Cash, 1=Credit Card, 2=Debit Card, 3=Mobile Payment)
+
+Important:
+- For major, understand common abbreviations: "CS" = Computer Science = STEM (0), "econ" = Economics = Business (1), "psych" = Psychology = Social Sciences (3), etc.
+- Extract just the numeric value from money amounts (e.g., "$500" -> 500, "about 300" -> 300)
+- If a value is unclear or missing, use reasonable defaults
+
+Return ONLY the JSON object, no other text or markdown."""
+
+
+# Answers the rule-based pass accepts as-is: the survey's select options
+# (and the category names for major), mapped to their integer codes
+SELECT_ANSWERS = {
+    "gender": {label.lower(): int(code) for code, label in GENDER_LABELS.items()},
+    "year_in_school": {label.lower(): int(code) for code, label in YEAR_LABELS.items()},
+    "major": {
+        **{label.lower(): int(code) for code, label in MAJOR_LABELS.items()},
+        "stem": 0, "law/pre-law": 7, "pre-law": 7,
+    },
+    "preferred_payment_method": {
+        **{label.lower(): int(code) for code, label in PAYMENT_METHOD_LABELS.items()},
+        "mobile payment (venmo, apple pay, etc.)": 3, "mobile payment": 3,
+    },
+}
+
+NUMBER_FIELDS = frozenset(["age", *FINANCIAL_FIELDS])
+
+NUMBER_RE = re.compile(r"\d+")
+
+# A bare amount such as "500", "$1,200" or "45.50"
+PLAIN_NUMBER_RE = re.compile(r"\$?\s*(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?")
+
 
 class ClaudeParserService:
     """
@@ -13,23 +83,41 @@ class ClaudeParserService:
     Uses Claude to understand and extract structured data from natural language.
     """
 
-    def __init__(self):
+    def __init__(self, cache: ResponseCache | None = None):
         self.api_key = settings.anthropic_api_key
-        self.client = anthropic.Anthropic(api_key=self.api_key) if self.api_key else None
+        self.cache = cache
+        self.client = get_client()
 
     async def parse(self, raw_answers: list[RawAnswer], user: User | None = None) -> SnapshotData:
         """
         Parse raw conversational answers into structured snapshot data.
-        Uses Claude API for intelligent parsing.
+        Uses Claude API for intelligent parsing unless every answer is
+        trivially parseable.
         """
 
-        if not (self.client and self.api_key):
-            raise RuntimeError("ClaudeParserService is not configured: missing API key or client.")
-
-        parsed = self._parse_with_claude(raw_answers)
+        # Plain numbers and picked options don't need Claude at all
+        parsed = self._parse_with_rules(raw_answers, user)
+        # Fresh Claude result, serialized before the profile override below;
+        # only cached once it has passed validation
+        to_cache = None
 
         if parsed is None:
-            raise ValueError("Failed to parse answers with Claude.")
+            if not (self.client and self.api_key):
+                raise RuntimeError("ClaudeParserService is not configured: missing API key or client.")
+
+            # Retried submissions with the same answers reuse the earlier parse
+            key = parser_key(raw_answers)
+            cached = await self.cache.get(key) if self.cache else None
+            if cached is not None:
+                parsed = orjson.loads(cached)
+            else:
+                parsed = await self._parse_with_claude(raw_answers)
+
+                if parsed is None:
+                    raise ValueError("Failed to parse answers with Claude.")
+
+                if self.cache:
+                    to_cache = orjson.dumps(parsed)
 
         # If user has profile, override parsed fields
         if user and user.has_profile:
@@ -46,71 +134,67 @@ class ClaudeParserService:
             user.year_in_school = parsed["year_in_school"]
             user.major = parsed["major"]
             user.preferred_payment_method = parsed["preferred_payment_method"]
+            user.update_profile_status()
 
         try:
-            return SnapshotData(**parsed)
+            snapshot = SnapshotData(**parsed)
         except Exception as e:
             raise ValueError(
                 f"Validation failed: {str(e)}. "
-                f"Parsed data: {json.dumps(parsed, indent=2)}"
+                f"Parsed data: {orjson.dumps(parsed, option=orjson.OPT_INDENT_2).decode()}"
             )
 
-    def _parse_with_claude(self, raw_answers: list[RawAnswer]) -> dict:
+        if to_cache is not None:
+            await self.cache.set(key, to_cache, CLAUDE_RESULT_TTL)
+        return snapshot
+
+    def _parse_with_rules(self, raw_answers: list[RawAnswer], user: User | None) -> dict | None:
+        """
+        Parse answers that need no interpretation.
+
+        Returns None unless every answer is a plain number or one of the
+        offered options and every required field is covered, so anything
+        ambiguous still goes to Claude.
+        """
+        parsed = {}
+        for a in raw_answers:
+            answer = a.answer.strip().lower()
+            if a.question_id in SELECT_ANSWERS:
+                value = SELECT_ANSWERS[a.question_id].get(answer)
+            elif a.question_id in NUMBER_FIELDS and PLAIN_NUMBER_RE.fullmatch(answer):
+                value = self._extract_number(answer, 0)
+            else:
+                return None
+            if value is None:
+                return None
+            parsed[a.question_id] = value
+
+        # Profile fields come from the user on check-ins
+        covered = parsed.keys() | (PROFILE_FIELDS if user and user.has_profile else ())
+        if not covered >= set(REQUIRED_FIELDS):
+            return None
+
+        is_valid, _ = validate_financial_data(parsed)
+        return parsed if is_valid else None
+
+    async def _parse_with_claude(self, raw_answers: list[RawAnswer]) -> dict:
         """Use Claude to parse raw answers into structured data."""
         # Format the answers for Claude
         answers_text = "\n".join([
             f"- {a.question_id}: {a.answer}" for a in raw_answers
         ])
 
-        prompt = f"""Parse the following survey answers into structured financial data. Extract the values and convert them to the specified formats.
-
-                    Survey Answers:
-                    {answers_text}
-                    
-                    Return a JSON object with these exact fields (use the integer codes specified):
-                    
-                    - age: integer (16-100)
-                    - gender: integer (0=Male, 1=Female, 2=Non-binary, 3=Prefer not to say)
-                    - year_in_school: integer (0=Freshman, 1=Sophomore, 2=Junior, 3=Senior, 4=Graduate)
-                    - major: integer - Map the field of study to one of these categories:
-                      0=STEM (includes CS, computer science, engineering, math, physics, chemistry, biology, data science, etc.)
-                      1=Business (includes finance, accounting, marketing, economics, MBA, etc.)
-                      2=Humanities (includes english, history, philosophy, languages, literature, etc.)
-                      3=Social Sciences (includes psychology, sociology, political science, anthropology, etc.)
-                      4=Arts (includes art, music, theater, design, film, etc.)
-                      5=Health Sciences (includes nursing, pre-med, public health, kinesiology, etc.)
-                      6=Education
-                      7=Law/Pre-Law
-                      8=Other
-                    - monthly_income: integer in dollars (extract number, default 0)
-                    - financial_aid: integer in dollars (extract number, default 0)
-                    - tuition: integer in dollars (extract number, default 0)
-                    - housing: integer in dollars (extract number, default 0)
-                    - food: integer in dollars (extract number, default 0)
-                    - transportation: integer in dollars (extract number, default 0)
-                    - books_supplies: integer in dollars (extract number, default 0)
-                    - entertainment: integer in dollars (extract number, default 0)
-                    - personal_care: integer in dollars (extract number, default 0)
-                    - technology: integer in dollars (extract number, default 0)
-                    - health_wellness: integer in dollars (extract number, default 0)
-                    - miscellaneous: integer in dollars (extract number, default 0)
-                    - preferred_payment_method: integer (0=Cash, 1=Credit Card, 2=Debit Card, 3=Mobile Payment)
-                    
-                    Important:
-                    - For major, understand common abbreviations: "CS" = Computer Science = STEM (0), "econ" = Economics = Business 
-                    (1), "psych" = Psychology = Social Sciences (3), etc.
-                    - Extract just the numeric value from money amounts (e.g., "$500" -> 500, "about 300" -> 300)
-                    - If a value is unclear or missing, use reasonable defaults
-                    
-                    Return ONLY the JSON object, no other text or markdown."""
-
-        message = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
+        async with claude_rate_limiter, claude_semaphore:
+            message = await self.client.messages.create(
+                model="claude-sonnet-4-20250514",
+                max_tokens=400,
+                temperature=0.0,
+                system=cached_system(PARSER_SYSTEM),
+                messages=[
+                    {"role": "user", "content": f"Survey Answers:\n{answers_text}"}
+                ]
+            )
+        log_cache_usage("parser", message)
 
         # Extract JSON from response
         response_text = message.content[0].text.strip()
@@ -118,25 +202,20 @@ class ClaudeParserService:
         # Try to parse as JSON
         try:
             # Handle case where response might have markdown code blocks
-            if response_text.startswith("```"):
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-                response_text = response_text.strip()
+            response_text = extract_json(response_text)
 
-            parsed = json.loads(response_text)
+            parsed = orjson.loads(response_text)
             return parsed
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             print(f"Failed to parse Claude response as JSON: {e}")
             print(f"Response was: {response_text}")
             raise ValueError("Claude response was not valid JSON.")
 
     def _extract_number(self, text: str, default: int) -> int:
         """Extract a number from text."""
-        import re
-        numbers = re.findall(r'\d+', text.replace(',', ''))
-        if numbers:
-            return int(numbers[0])
+        match = NUMBER_RE.search(text.replace(',', ''))
+        if match:
+            return int(match.group())
         return default
 
     def _extract_gender(self, text: str) -> int:
@@ -194,28 +273,3 @@ class ClaudeParserService:
         elif any(w in text for w in ["mobile", "venmo", "cash app", "apple pay"]):
             return 3
         return 2  # default debit
-
-    def _get_parser_prompt(self) -> str:
-        """Get the system prompt for the parser agent."""
-        return """You are a financial data parser. Your job is to extract structured financial information from conversational answers.
-
-                Given a list of question-answer pairs, extract the following fields as integers:
-                - age (16-100)
-                - gender (0=Male, 1=Female, 2=Non-binary, 3=Prefer not to say)
-                - year_in_school (0=Freshman, 1=Sophomore, 2=Junior, 3=Senior, 4=Graduate)
-                - major (0=STEM, 1=Business, 2=Humanities, 3=Social Sciences, 4=Arts, 5=Health Sciences, 6=Education, 7=Law, 8=Other)
-                - monthly_income (total monthly income in dollars)
-                - financial_aid (monthly financial aid amount)
-                - tuition (monthly tuition cost)
-                - housing (monthly housing cost)
-                - food (monthly food spending)
-                - transportation (monthly transportation cost)
-                - books_supplies (monthly books and supplies cost)
-                - entertainment (monthly entertainment spending)
-                - personal_care (monthly personal care spending)
-                - technology (monthly technology spending)
-                - health_wellness (monthly health and wellness spending)
-                - miscellaneous (monthly miscellaneous spending)
-                - preferred_payment_method (0=Cash, 1=Credit Card, 2=Debit Card, 3=Mobile Payment)
-                
-                Return ONLY a valid JSON object with these fields. Make reasonable inferences when information is ambiguous."""
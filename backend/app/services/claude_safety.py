@@ -9,16 +9,33 @@ This module provides preventative safety measures including:
 """
 
 import re
-import json
+import copy
 import logging
+import queue
+import orjson
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
 
 # Set up logging for audit trail
 logger = logging.getLogger(__name__)
 
+# Per-interaction audit lines; while start_audit_log() is active they go
+# through a bounded queue and a background thread, off the request path
+audit_logger = logging.getLogger(f"{__name__}.audit")
+AUDIT_QUEUE_SIZE = 10_000
+_audit_listener = None
+
 # Maximum lengths for inputs
 MAX_USER_MESSAGE_LENGTH = 2000
 MAX_FIELD_VALUE = 1_000_000  # Max dollar amount
 
+# Dollar amounts checked by validate_financial_data
+NUMERIC_FIELDS = frozenset([
+    'monthly_income', 'financial_aid', 'tuition', 'housing', 'food',
+    'transportation', 'books_supplies', 'entertainment', 'personal_care',
+    'technology', 'health_wellness', 'miscellaneous'
+])
+
 # Patterns that should never appear in outputs
 HARMFUL_PATTERNS = [
     r'\b(kill|suicide|self-harm|hurt yourself)\b',
@@ -38,158 +55,263 @@ RESTRICTED_TOPICS = [
     'bankruptcy',
 ]
 
+# Appended to every coaching/summary prompt; flush-left so no indentation
+# is sent to the API
+SAFETY_FOOTER = """
+
+SAFETY REMINDERS:
+- Never provide specific investment, tax, or legal advice
+- Do not make claims about guaranteed outcomes
+- Keep tone supportive and non-judgmental
+- If unsure, err on the side of caution
+- Focus only on general budgeting awareness and financial literacy"""
+
+# Phrasings that turn a mention of a restricted topic into advice
+ADVICE_LEADS = [
+    'you should',
+    'i recommend',
+    'invest in',
+    'buy',
+]
 
-class ClaudeSafetyGuard:
-    """Safety guardrails for Claude API interactions."""
-
-    @staticmethod
-    def sanitize_user_input(message: str) -> str:
-        """
-        Sanitize user input before sending to Claude.
-
-        - Truncates overly long messages
-        - Removes potential injection attempts
-        - Strips dangerous characters
-        """
-        if not message:
-            return ""
-
-        # Truncate to max length
-        if len(message) > MAX_USER_MESSAGE_LENGTH:
-            message = message[:MAX_USER_MESSAGE_LENGTH] + "..."
-            logger.warning(f"User message truncated from {len(message)} chars")
-
-        # Remove potential prompt injection patterns
-        injection_patterns = [
-            r'ignore previous instructions',
-            r'disregard all prior',
-            r'forget everything',
-            r'you are now',
-            r'new instructions:',
-            r'system prompt:',
-        ]
-
-        for pattern in injection_patterns:
-            if re.search(pattern, message, re.IGNORECASE):
-                logger.warning(f"Potential prompt injection detected: {pattern}")
-                message = re.sub(pattern, '[removed]', message, flags=re.IGNORECASE)
-
-        return message.strip()
-
-    @staticmethod
-    def validate_financial_data(data: dict) -> tuple[bool, str]:
-        """
-        Validate financial input data is within reasonable bounds.
-
-        Returns (is_valid, error_message)
-        """
-        numeric_fields = [
-            'monthly_income', 'financial_aid', 'tuition', 'housing', 'food',
-            'transportation', 'books_supplies', 'entertainment', 'personal_care',
-            'technology', 'health_wellness', 'miscellaneous'
-        ]
-
-        for field in numeric_fields:
-            if field in data:
-                value = data[field]
-                if not isinstance(value, (int, float)):
-                    return False, f"{field} must be a number"
-                if value < 0:
-                    return False, f"{field} cannot be negative"
-                if value > MAX_FIELD_VALUE:
-                    return False, f"{field} exceeds maximum allowed value"
-
-        # Validate age
-        if 'age' in data:
-            age = data['age']
-            if not isinstance(age, int) or age < 16 or age > 100:
-                return False, "Age must be between 16 and 100"
-
-        return True, ""
-
-    @staticmethod
-    def check_output_safety(response_text: str) -> tuple[bool, str]:
-        """
-        Check Claude's output for harmful content.
-
-        Returns (is_safe, warning_message)
-        """
-        response_lower = response_text.lower()
-
-        # Check for harmful patterns
-        for pattern in HARMFUL_PATTERNS:
-            if re.search(pattern, response_lower):
-                logger.warning(f"Harmful pattern detected in output: {pattern}")
-                return False, f"Response contained potentially harmful content"
-
-        # Check for restricted financial advice topics
-        for topic in RESTRICTED_TOPICS:
-            # Only flag if it looks like advice, not just mentioning
-            advice_patterns = [
-                f"you should.*{topic}",
-                f"i recommend.*{topic}",
-                f"invest in.*{topic}",
-                f"buy.*{topic}",
-            ]
-            for pattern in advice_patterns:
-                if re.search(pattern, response_lower):
-                    logger.warning(f"Restricted financial advice detected: {topic}")
-                    return False, f"Response contained advice on restricted topic: {topic}"
-
-        return True, ""
-
-    @staticmethod
-    def validate_json_response(response_text: str, required_fields: list[str]) -> tuple[bool, dict | None, str]:
-        """
-        Validate that Claude's response is valid JSON with required fields.
-
-        Returns (is_valid, parsed_data, error_message)
-        """
-        # Handle markdown code blocks
-        text = response_text.strip()
-        if text.startswith("```"):
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-            text = text.strip()
+# Prompt injection attempts stripped from user input
+INJECTION_PATTERNS = [
+    r'ignore previous instructions',
+    r'disregard all prior',
+    r'forget everything',
+    r'you are now',
+    r'new instructions:',
+    r'system prompt:',
+]
 
+# Each category is one alternation, so a check is a single scan of the text
+INJECTION_RE = re.compile("|".join(INJECTION_PATTERNS), re.IGNORECASE)
+HARMFUL_RE = re.compile("|".join(HARMFUL_PATTERNS), re.IGNORECASE)
+ADVICE_RE = re.compile(
+    f"(?:{'|'.join(ADVICE_LEADS)}).*({'|'.join(RESTRICTED_TOPICS)})",
+    re.IGNORECASE
+)
+
+# Markdown code fence around a JSON reply; the closing fence may be missing
+CODEFENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*(?:```|\Z)", re.DOTALL)
+# Outermost object in a reply that wraps it in prose without a fence
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def extract_json(response_text: str) -> str:
+    """
+    Return the JSON body of a reply.
+
+    Takes the contents of the first code fence if there is one, otherwise
+    the outermost {...} span, so a sentence before or after the object
+    doesn't fail the parse.
+    """
+    match = CODEFENCE_RE.search(response_text) or JSON_OBJECT_RE.search(response_text)
+    if match is None:
+        return response_text.strip()
+    return match.group(match.lastindex or 0)
+
+
+def sanitize_user_input(message: str) -> str:
+    """
+    Sanitize user input before sending to Claude.
+
+    - Truncates overly long messages
+    - Removes potential injection attempts
+    - Strips dangerous characters
+    """
+    if not message:
+        return ""
+
+    # Truncate to max length
+    original_length = len(message)
+    if original_length > MAX_USER_MESSAGE_LENGTH:
+        message = message[:MAX_USER_MESSAGE_LENGTH] + "..."
+        logger.warning(f"User message truncated from {original_length} chars")
+
+    # Remove potential prompt injection patterns
+    message, removed = INJECTION_RE.subn('[removed]', message)
+    if removed:
+        logger.warning(f"Potential prompt injection patterns removed: {removed}")
+
+    return message.strip()
+
+
+def validate_financial_data(data: dict) -> tuple[bool, str]:
+    """
+    Validate financial input data is within reasonable bounds.
+
+    Returns (is_valid, error_message)
+    """
+    # Only the fields actually present are visited
+    for field, value in data.items():
+        if field not in NUMERIC_FIELDS:
+            continue
+        if type(value) not in (int, float):
+            return False, f"{field} must be a number"
+        if value < 0:
+            return False, f"{field} cannot be negative"
+        if value > MAX_FIELD_VALUE:
+            return False, f"{field} exceeds maximum allowed value"
+
+    # Validate age
+    if 'age' in data:
+        age = data['age']
+        if not isinstance(age, int) or age < 16 or age > 100:
+            return False, "Age must be between 16 and 100"
+
+    return True, ""
+
+
+# Responses recur (retries, deterministic prompts), so the checks below are
+# memoized on the response text and only scan each distinct output once.
+# Logging stays in the public wrappers so every repeat hit is still recorded.
+@lru_cache(maxsize=2048)
+def _check_output_safety(response_text: str) -> tuple[bool, str, str]:
+    # Check for harmful patterns
+    match = HARMFUL_RE.search(response_text)
+    if match:
+        return (
+            False,
+            "Response contained potentially harmful content",
+            f"Harmful pattern detected in output: {match.group(0)}"
+        )
+
+    # Check for restricted financial advice topics
+    # Only flag if it looks like advice, not just mentioning
+    match = ADVICE_RE.search(response_text)
+    if match:
+        topic = match.group(1).lower()
+        return (
+            False,
+            f"Response contained advice on restricted topic: {topic}",
+            f"Restricted financial advice detected: {topic}"
+        )
+
+    return True, "", ""
+
+
+def check_output_safety(response_text: str) -> tuple[bool, str]:
+    """
+    Check Claude's output for harmful content.
+
+    Returns (is_safe, warning_message)
+    """
+    is_safe, warning, detail = _check_output_safety(response_text)
+    if not is_safe:
+        logger.warning(detail)
+    return is_safe, warning
+
+
+@lru_cache(maxsize=2048)
+def _validate_json_response(response_text: str, required_fields: tuple[str, ...]) -> tuple[bool, dict | None, str, str]:
+    # Handle markdown code blocks
+    text = extract_json(response_text)
+
+    try:
+        parsed = orjson.loads(text)
+    except orjson.JSONDecodeError as e:
+        return False, None, f"Invalid JSON: {str(e)}", f"Invalid JSON response: {e}"
+
+    # Check required fields
+    missing = [f for f in required_fields if f not in parsed]
+    if missing:
+        return False, None, f"Missing fields: {', '.join(missing)}", f"Missing required fields: {missing}"
+
+    return True, parsed, "", ""
+
+
+def validate_json_response(response_text: str, required_fields: list[str]) -> tuple[bool, dict | None, str]:
+    """
+    Validate that Claude's response is valid JSON with required fields.
+
+    Returns (is_valid, parsed_data, error_message)
+    """
+    is_valid, parsed, error, detail = _validate_json_response(response_text, tuple(required_fields))
+    if not is_valid:
+        logger.error(detail)
+        return is_valid, None, error
+    # The cached dict and its nested lists are shared between calls; hand
+    # out a deep copy so callers can't mutate the cache entry
+    return is_valid, copy.deepcopy(parsed), error
+
+
+def add_safety_context(prompt: str) -> str:
+    """
+    Add safety reminders to the prompt.
+    """
+    return prompt + SAFETY_FOOTER
+
+
+def log_interaction(service_name: str, input_summary: str, output_summary: str, success: bool):
+    """
+    Log Claude API interactions for audit trail.
+    """
+    if not audit_logger.isEnabledFor(logging.INFO):
+        return
+    status = "SUCCESS" if success else "FAILURE"
+    audit_logger.info(
+        "[%s] %s - Input: %.100s... Output: %.100s...",
+        service_name, status, input_summary, output_summary
+    )
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records rather than blocking when the queue is full."""
+
+    def enqueue(self, record):
         try:
-            parsed = json.loads(text)
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON response: {e}")
-            return False, None, f"Invalid JSON: {str(e)}"
-
-        # Check required fields
-        missing = [f for f in required_fields if f not in parsed]
-        if missing:
-            logger.error(f"Missing required fields: {missing}")
-            return False, None, f"Missing fields: {', '.join(missing)}"
-
-        return True, parsed, ""
-
-    @staticmethod
-    def add_safety_context(prompt: str) -> str:
-        """
-        Add safety reminders to the prompt.
-        """
-        safety_footer = """
-
-            SAFETY REMINDERS:
-            - Never provide specific investment, tax, or legal advice
-            - Do not make claims about guaranteed outcomes
-            - Keep tone supportive and non-judgmental
-            - If unsure, err on the side of caution
-            - Focus only on general budgeting awareness and financial literacy"""
-
-        return prompt + safety_footer
-
-    @staticmethod
-    def log_interaction(service_name: str, input_summary: str, output_summary: str, success: bool):
-        """
-        Log Claude API interactions for audit trail.
-        """
-        status = "SUCCESS" if success else "FAILURE"
-        logger.info(f"[{service_name}] {status} - Input: {input_summary[:100]}... Output: {output_summary[:100]}...")
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+class _ForwardHandler(logging.Handler):
+    """Hand queued audit records on to this module's logger and its handlers."""
+
+    def emit(self, record):
+        logger.handle(record)
+
+
+def start_audit_log() -> None:
+    """Start writing audit lines from a background thread."""
+    global _audit_listener
+    if _audit_listener is not None:
+        return
+    audit_queue = queue.Queue(AUDIT_QUEUE_SIZE)
+    _audit_listener = QueueListener(audit_queue, _ForwardHandler())
+    audit_logger.addHandler(_DroppingQueueHandler(audit_queue))
+    audit_logger.propagate = False
+    _audit_listener.start()
+
+
+def stop_audit_log() -> None:
+    """Flush queued audit lines and go back to logging them inline."""
+    global _audit_listener
+    if _audit_listener is None:
+        return
+    for handler in list(audit_logger.handlers):
+        if isinstance(handler, _DroppingQueueHandler):
+            audit_logger.removeHandler(handler)
+    audit_logger.propagate = True
+    _audit_listener.stop()
+    _audit_listener = None
+
+
+class ClaudeSafetyGuard:
+    """
+    Safety guardrails for Claude API interactions.
+
+    Kept for existing callers; the checks themselves are the module-level
+    functions above, which the services call directly.
+    """
+
+    sanitize_user_input = staticmethod(sanitize_user_input)
+    validate_financial_data = staticmethod(validate_financial_data)
+    check_output_safety = staticmethod(check_output_safety)
+    validate_json_response = staticmethod(validate_json_response)
+    add_safety_context = staticmethod(add_safety_context)
+    log_interaction = staticmethod(log_interaction)
 
 
 # Singleton instance for easy import
@@ -1,15 +1,103 @@
-import json
 import logging
-import anthropic
 from ..schemas.intake import SnapshotData
 from ..schemas.dashboard import SummaryOutput, Analytics
 from ..schemas.ml import MLOutput
 from ..config import get_settings
-from .claude_safety import safety_guard
+from ..utils.cache import CLAUDE_RESULT_TTL, ResponseCache, summary_key
+from .claude_safety import add_safety_context, check_output_safety, log_interaction, validate_financial_data, validate_json_response
+from .anthropic_client import get_client, claude_rate_limiter, claude_semaphore, cached_system, log_cache_usage
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Static part of the summarizer prompt, safety footer included. It goes out as
+# a cached system block so only the per-user context is processed fresh.
+SUMMARIZER_SYSTEM = add_safety_context("""You are a friendly financial summarizer for college students. Your role is to give them a quick, warm snapshot of their situation—like a supportive friend who's good with numbers.
+
+FORMAT: "Glance and Go"
+- summary_paragraph: ONE sentence, casual and warm—like texting a friend
+- key_points: 3-4 quick facts for context
+
+CRITICAL TONE GUIDELINES:
+- Warm and personal—speak directly to them ("you're", "your")
+- Casual but clear—like a friend explaining, not a report
+- Ultra-concise—keep it scannable
+- Non-judgmental—neutral observations, no criticism
+- Interpretation only—NO advice (that's the teacher's job)
+
+This is a SUPPORT tool, not an analytics tool. Make students feel seen and understood, not analyzed.
+
+Given:
+- Their spending snapshot (income, expenses by category)
+- ML model outputs (overspending probability, financial stress probability)
+- Computed analytics (shares, totals, ratios)
+
+Create a response with:
+1. summary_paragraph: ONE warm, casual sentence that:
+   - Speaks directly to them in second person
+   - Feels personal, not clinical
+   - Under 15 words
+   - Example good: "You're spending about $715 more than you're bringing in each month."
+   - Example good: "You've got a nice $200 cushion each month—solid!"
+   - Example bad: "Your monthly expenses of $3,015 are exceeding your combined income and financial aid of $2,300 by approximately $715." (too formal, too long)
+   - Example bad: "This gap represents a common challenge many students face..." (impersonal, sounds like a report)
+
+2. key_points: 3-4 INSIGHTFUL observations that:
+   - Reveal patterns or context they might not have noticed
+   - Transform raw numbers into meaningful insights
+   - Use percentages, daily amounts, or comparisons—not just raw totals
+   - Be striking and evocative—make them think "oh, I didn't realize that"
+   - 8-12 words each, casual tone
+
+   GOOD examples (provide insight):
+   - "Food is eating up 35% of everything you spend"
+   - "That's about $14/day on food alone"
+   - "Entertainment + food = half your monthly spending"
+   - "You're $715 short each month—about $24/day"
+
+   BAD examples (just repeating inputs):
+   - "Your biggest expense is food at $420/month" (they already know this)
+   - "You're bringing in $2,300 total each month" (they entered this)
+   - "Your housing costs $800/month" (no insight, just echo)
+
+Return ONLY a valid JSON object with "summary_paragraph" (string) and "key_points" (array of strings).
+
+Generate a quick, glanceable summary. Return ONLY a valid JSON object with "summary_paragraph" (1 sentence max, like a headline) and "key_points" (array of 3-4 short facts). Remember: interpret data only, no advice.""")
+
+
+YEAR_NAMES = ("Freshman", "Sophomore", "Junior", "Senior", "Graduate")
+
+# Per-user part of the prompt, filled from the snapshot, analytics and ML output
+CONTEXT_TMPL = """Student Financial Data:
+- Age: {age}
+- Year: {year_name}
+- Monthly Income: ${monthly_income}
+- Financial Aid: ${financial_aid}
+
+Monthly Expenses:
+- Tuition: ${tuition}
+- Housing: ${housing}
+- Food: ${food}
+- Transportation: ${transportation}
+- Books/Supplies: ${books_supplies}
+- Entertainment: ${entertainment}
+- Personal Care: ${personal_care}
+- Technology: ${technology}
+- Health/Wellness: ${health_wellness}
+- Miscellaneous: ${miscellaneous}
+
+Analytics:
+- Total Resources: ${total_resources}
+- Total Spending: ${total_spending}
+- Net Balance: ${net_balance}
+- Food Share: {food_share:.1%}
+- Entertainment Share: {entertainment_share:.1%}
+- Discretionary Share: {discretionary_share:.1%}
+
+Risk Assessment:
+- Overspending Probability: {overspending_prob:.1%}
+- Financial Stress Probability: {financial_stress_prob:.1%}"""
+
 
 class ClaudeSummarizerService:
     """
@@ -17,9 +105,10 @@ class ClaudeSummarizerService:
     Uses Claude to create personalized, empathetic summaries.
     """
 
-    def __init__(self):
+    def __init__(self, cache: ResponseCache | None = None):
         self.api_key = settings.anthropic_api_key
-        self.client = anthropic.Anthropic(api_key=self.api_key) if self.api_key else None
+        self.cache = cache
+        self.client = get_client()
 
     async def summarize(
         self,
@@ -32,110 +121,88 @@ class ClaudeSummarizerService:
         Uses Claude API for intelligent summarization.
         """
         # Validate input data
-        input_data = snapshot.model_dump() if hasattr(snapshot, 'model_dump') else snapshot.__dict__
-        is_valid, error = safety_guard.validate_financial_data(input_data)
+        # Dumped once; the same dict feeds validation, the cache key and the prompt
+        snapshot_data = snapshot.model_dump()
+        is_valid, error = validate_financial_data(snapshot_data)
         if not is_valid:
             logger.error(f"Invalid financial data: {error}")
-            return self._generate_fallback_summary(snapshot, ml_output, analytics)
+            return self._generate_fallback_summary(analytics)
 
         # Try Claude API first, fall back to minimal response if unavailable
         if self.client and self.api_key:
+            key = summary_key(snapshot_data, ml_output, analytics)
+            cached = await self.cache.get(key) if self.cache else None
+            if cached is not None:
+                return SummaryOutput.model_validate_json(cached)
             try:
-                result = self._summarize_with_claude(snapshot, ml_output, analytics)
-                safety_guard.log_interaction("summarizer", "financial_snapshot", result.summary_paragraph[:50], True)
+                result = await self._summarize_with_claude(snapshot_data, ml_output, analytics)
+                # Fallbacks aren't cached, so a later call can still get a real summary
+                if result is None:
+                    return self._generate_fallback_summary(analytics)
+                if self.cache:
+                    await self.cache.set(key, result.model_dump_json().encode(), CLAUDE_RESULT_TTL)
+                log_interaction("summarizer", "financial_snapshot", result.summary_paragraph[:50], True)
                 return result
             except Exception as e:
                 logger.error(f"Claude summarization failed: {e}")
-                safety_guard.log_interaction("summarizer", "financial_snapshot", str(e), False)
-                return self._generate_fallback_summary(snapshot, ml_output, analytics)
+                log_interaction("summarizer", "financial_snapshot", str(e), False)
+                return self._generate_fallback_summary(analytics)
         else:
-            return self._generate_fallback_summary(snapshot, ml_output, analytics)
+            return self._generate_fallback_summary(analytics)
 
-    def _summarize_with_claude(
+    async def _summarize_with_claude(
         self,
-        snapshot: SnapshotData,
+        snapshot_data: dict,
         ml_output: MLOutput,
         analytics: Analytics
-    ) -> SummaryOutput:
-        """Use Claude to generate a personalized summary."""
+    ) -> SummaryOutput | None:
+        """Use Claude to generate a personalized summary; None if the reply is unusable."""
         # Prepare the context for Claude
-        context = f"""Student Financial Data:
-                    - Age: {snapshot.age}
-                    - Year: {["Freshman", "Sophomore", "Junior", "Senior", "Graduate"][snapshot.year_in_school]}
-                    - Monthly Income: ${snapshot.monthly_income}
-                    - Financial Aid: ${snapshot.financial_aid}
-                    
-                    Monthly Expenses:
-                    - Tuition: ${snapshot.tuition}
-                    - Housing: ${snapshot.housing}
-                    - Food: ${snapshot.food}
-                    - Transportation: ${snapshot.transportation}
-                    - Books/Supplies: ${snapshot.books_supplies}
-                    - Entertainment: ${snapshot.entertainment}
-                    - Personal Care: ${snapshot.personal_care}
-                    - Technology: ${snapshot.technology}
-                    - Health/Wellness: ${snapshot.health_wellness}
-                    - Miscellaneous: ${snapshot.miscellaneous}
-                    
-                    Analytics:
-                    - Total Resources: ${analytics.total_resources}
-                    - Total Spending: ${analytics.total_spending}
-                    - Net Balance: ${analytics.net_balance}
-                    - Food Share: {analytics.food_share * 100:.1f}%
-                    - Entertainment Share: {analytics.entertainment_share * 100:.1f}%
-                    - Discretionary Share: {analytics.discretionary_share * 100:.1f}%
-                    
-                    Risk Assessment:
-                    - Overspending Probability: {ml_output.overspending_prob * 100:.1f}%
-                    - Financial Stress Probability: {ml_output.financial_stress_prob * 100:.1f}%"""
-
-        base_prompt = f"""{self._get_summarizer_prompt()}
-                            
-                            {context}
-                            
-                            Generate a quick, glanceable summary. Return ONLY a valid JSON object with "summary_paragraph" (1 sentence max, like a headline) and "key_points" (array of 3-4 short facts). Remember: interpret data only, no advice."""
-
-        # Add safety context
-        prompt = safety_guard.add_safety_context(base_prompt)
-
-        message = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
+        year = snapshot_data["year_in_school"]
+        values = {
+            **snapshot_data,
+            **analytics.model_dump(),
+            **ml_output.model_dump(),
+            "year_name": YEAR_NAMES[year] if 0 <= year < len(YEAR_NAMES) else "Student",
+        }
+        context = CONTEXT_TMPL.format_map(values)
+
+        async with claude_rate_limiter, claude_semaphore:
+            message = await self.client.messages.create(
+                model="claude-sonnet-4-20250514",
+                max_tokens=250,
+                system=cached_system(SUMMARIZER_SYSTEM),
+                messages=[
+                    {"role": "user", "content": context}
+                ]
+            )
+        log_cache_usage("summarizer", message)
 
         # Extract JSON from response
         response_text = message.content[0].text.strip()
 
         # Validate output safety
-        is_safe, warning = safety_guard.check_output_safety(response_text)
+        is_safe, warning = check_output_safety(response_text)
         if not is_safe:
             logger.warning(f"Unsafe output detected: {warning}")
-            return self._generate_fallback_summary(snapshot, ml_output, analytics)
+            return None
 
         # Validate JSON response
-        is_valid, parsed, error = safety_guard.validate_json_response(
+        is_valid, parsed, error = validate_json_response(
             response_text,
             ["summary_paragraph", "key_points"]
         )
 
         if not is_valid:
             logger.error(f"Invalid response format: {error}")
-            return self._generate_fallback_summary(snapshot, ml_output, analytics)
+            return None
 
         return SummaryOutput(
             summary_paragraph=parsed["summary_paragraph"],
             key_points=parsed["key_points"]
         )
 
-    def _generate_fallback_summary(
-        self,
-        snapshot: SnapshotData,
-        ml_output: MLOutput,
-        analytics: Analytics
-    ) -> SummaryOutput:
+    def _generate_fallback_summary(self, analytics: Analytics) -> SummaryOutput:
         """Generate a minimal fallback when Claude API is unavailable."""
         # Simple factual summary without AI interpretation
         if analytics.net_balance < 0:
@@ -151,55 +218,3 @@ class ClaudeSummarizerService:
                 f"Net balance: ${analytics.net_balance}/month"
             ]
         )
-
-    def _get_summarizer_prompt(self) -> str:
-        """Get the system prompt for the summarizer agent."""
-        return """You are a friendly financial summarizer for college students. Your role is to give them a quick, warm snapshot of their situation—like a supportive friend who's good with numbers.
-                
-                FORMAT: "Glance and Go"
-                - summary_paragraph: ONE sentence, casual and warm—like texting a friend
-                - key_points: 3-4 quick facts for context
-                
-                CRITICAL TONE GUIDELINES:
-                - Warm and personal—speak directly to them ("you're", "your")
-                - Casual but clear—like a friend explaining, not a report
-                - Ultra-concise—keep it scannable
-                - Non-judgmental—neutral observations, no criticism
-                - Interpretation only—NO advice (that's the teacher's job)
-                
-                This is a SUPPORT tool, not an analytics tool. Make students feel seen and understood, not analyzed.
-                
-                Given:
-                - Their spending snapshot (income, expenses by category)
-                - ML model outputs (overspending probability, financial stress probability)
-                - Computed analytics (shares, totals, ratios)
-                
-                Create a response with:
-                1. summary_paragraph: ONE warm, casual sentence that:
-                   - Speaks directly to them in second person
-                   - Feels personal, not clinical
-                   - Under 15 words
-                   - Example good: "You're spending about $715 more than you're bringing in each month."
-                   - Example good: "You've got a nice $200 cushion each month—solid!"
-                   - Example bad: "Your monthly expenses of $3,015 are exceeding your combined income and financial aid of $2,300 by approximately $715." (too formal, too long)
-                   - Example bad: "This gap represents a common challenge many students face..." (impersonal, sounds like a report)
-                
-                2. key_points: 3-4 INSIGHTFUL observations that:
-                   - Reveal patterns or context they might not have noticed
-                   - Transform raw numbers into meaningful insights
-                   - Use percentages, daily amounts, or comparisons—not just raw totals
-                   - Be striking and evocative—make them think "oh, I didn't realize that"
-                   - 8-12 words each, casual tone
-                
-                   GOOD examples (provide insight):
-                   - "Food is eating up 35% of everything you spend"
-                   - "That's about $14/day on food alone"
-                   - "Entertainment + food = half your monthly spending"
-                   - "You're $715 short each month—about $24/day"
-                
-                   BAD examples (just repeating inputs):
-                   - "Your biggest expense is food at $420/month" (they already know this)
-                   - "You're bringing in $2,300 total each month" (they entered this)
-                   - "Your housing costs $800/month" (no insight, just echo)
-                
-                Return ONLY a valid JSON object with "summary_paragraph" (string) and "key_points" (array of strings)."""
@@ -1,19 +1,143 @@
+from types import MappingProxyType
+
 from ..config import get_settings
 
 settings = get_settings()
 
 # Profile fields (collected once, stored in user profile)
-PROFILE_FIELDS = ["age", "gender", "year_in_school", "major", "preferred_payment_method"]
+PROFILE_FIELDS = ("age", "gender", "year_in_school", "major", "preferred_payment_method")
 
 # Financial fields (collected every check-in)
-FINANCIAL_FIELDS = [
+FINANCIAL_FIELDS = (
     "monthly_income", "financial_aid", "tuition", "housing", "food", "transportation",
     "books_supplies", "entertainment", "personal_care", "technology", "health_wellness", "miscellaneous"
-]
+)
 
 # All required fields for the ML model
 REQUIRED_FIELDS = PROFILE_FIELDS + FINANCIAL_FIELDS
 
+# (ask order, membership set) for each flow, built once at import
+CHECKIN_REQUIRED = (FINANCIAL_FIELDS, frozenset(FINANCIAL_FIELDS))
+ONBOARDING_REQUIRED = (REQUIRED_FIELDS, frozenset(REQUIRED_FIELDS))
+
+# Conversational question for each field, used by the rule-based flow
+MOCK_QUESTIONS = MappingProxyType({
+    "age": {
+        "question": "Let's start with the basics! How old are you?",
+        "context": "This helps me tailor advice to your life stage.",
+        "suggested_type": "number"
+    },
+    "gender": {
+        "question": "How do you identify?",
+        "context": "This helps personalize your experience.",
+        "suggested_type": "select",
+        "options": ["Male", "Female", "Non-binary", "Prefer not to say"]
+    },
+    "year_in_school": {
+        "question": "What year are you in school?",
+        "context": "Different years come with different financial challenges.",
+        "suggested_type": "select",
+        "options": ["Freshman", "Sophomore", "Junior", "Senior", "Graduate"]
+    },
+    "major": {
+        "question": "What are you studying?",
+        "context": "Your major can affect both expenses and future income.",
+        "suggested_type": "text"
+    },
+    "monthly_income": {
+        "question": "How much money do you bring in each month?",
+        "context": "Include jobs, allowances, gig work—everything that comes in regularly.",
+        "suggested_type": "number"
+    },
+    "financial_aid": {
+        "question": "Do you receive any financial aid? How much per month?",
+        "context": "Include scholarships, grants, and any loan money you use for living expenses.",
+        "suggested_type": "number"
+    },
+    "tuition": {
+        "question": "What's your monthly tuition cost?",
+        "context": "If you pay per semester, just divide by the number of months.",
+        "suggested_type": "number"
+    },
+    "housing": {
+        "question": "How much do you spend on housing each month?",
+        "context": "Include rent, utilities, internet—the whole package.",
+        "suggested_type": "number"
+    },
+    "food": {
+        "question": "What about food? How much do you typically spend monthly?",
+        "context": "Groceries, meal plans, dining out, coffee runs—all of it counts!",
+        "suggested_type": "number"
+    },
+    "transportation": {
+        "question": "How much do you spend getting around?",
+        "context": "Gas, public transit, rideshares, bike maintenance—whatever you use.",
+        "suggested_type": "number"
+    },
+    "books_supplies": {
+        "question": "What do books and supplies cost you monthly?",
+        "context": "Textbooks, lab materials, school supplies. If it varies, give me an average.",
+        "suggested_type": "number"
+    },
+    "entertainment": {
+        "question": "Now for the fun stuff—how much goes to entertainment?",
+        "context": "Streaming, games, concerts, nights out with friends.",
+        "suggested_type": "number"
+    },
+    "personal_care": {
+        "question": "What about personal care and self-maintenance?",
+        "context": "Haircuts, skincare, gym, clothes—taking care of yourself.",
+        "suggested_type": "number"
+    },
+    "technology": {
+        "question": "Any regular technology expenses?",
+        "context": "Phone plan, app subscriptions, software you need.",
+        "suggested_type": "number"
+    },
+    "health_wellness": {
+        "question": "What do you spend on health and wellness?",
+        "context": "Insurance, medications, therapy, doctor visits.",
+        "suggested_type": "number"
+    },
+    "miscellaneous": {
+        "question": "Anything else we haven't covered?",
+        "context": "Gifts, random purchases, unexpected expenses—the stuff that doesn't fit elsewhere.",
+        "suggested_type": "number"
+    },
+    "preferred_payment_method": {
+        "question": "Last one! How do you usually pay for things?",
+        "context": "This tells me a bit about your spending habits.",
+        "suggested_type": "select",
+        "options": ["Cash", "Credit Card", "Debit Card", "Mobile Payment (Venmo, Apple Pay, etc.)"]
+    }
+})
+
+
+# System prompt for Claude-generated questions, built once at import
+SURVEY_PROMPT = """You are a friendly financial coach collecting information from a college student. Your goal is to gather their financial data through a natural, conversational flow.
+
+Based on the conversation so far, generate the next question to ask. Be:
+- Warm and conversational, not robotic
+- Brief but clear
+- Encouraging when appropriate
+
+You need to collect these fields (mark which ones you've already gotten):
+- age, gender, year_in_school, major
+- monthly_income, financial_aid
+- tuition, housing, food, transportation
+- books_supplies, entertainment, personal_care
+- technology, health_wellness, miscellaneous
+- preferred_payment_method
+
+Return JSON with:
+{
+  "field": "the_field_being_asked",
+  "question": "Your conversational question",
+  "context": "Optional helper text",
+  "suggested_type": "number|text|select",
+  "options": ["only", "for", "select", "types"]
+}"""
+
 
 class ClaudeSurveyService:
     """
@@ -27,7 +151,7 @@ class ClaudeSurveyService:
     async def generate_next_question(
         self,
         conversation_history: list[dict],
-        collected_fields: list[str],
+        collected_fields: set[str],
         has_profile: bool = False
     ) -> dict:
         """
@@ -53,22 +177,18 @@ class ClaudeSurveyService:
     def _generate_mock_question(
         self,
         conversation_history: list[dict],
-        collected_fields: list[str],
+        collected_fields: set[str],
         has_profile: bool = False
     ) -> dict:
         """Generate questions based on what's still needed."""
 
-        # Determine which fields to collect
-        if has_profile:
-            # Check-in: only collect financial fields
-            required = FINANCIAL_FIELDS
-        else:
-            # Initial onboarding: collect all fields
-            required = REQUIRED_FIELDS
+        # Check-in only collects financial fields; onboarding collects all
+        required, required_set = CHECKIN_REQUIRED if has_profile else ONBOARDING_REQUIRED
 
-        missing_fields = [f for f in required if f not in collected_fields]
+        # Get the next field to ask about
+        next_field = next((f for f in required if f not in collected_fields), None)
 
-        if not missing_fields:
+        if next_field is None:
             return {
                 "question": None,
                 "context": None,
@@ -79,106 +199,11 @@ class ClaudeSurveyService:
                 "progress": 1.0
             }
 
-        # Get the next field to ask about
-        next_field = missing_fields[0]
-
-        # Generate conversational questions based on field
-        questions = {
-            "age": {
-                "question": "Let's start with the basics! How old are you?",
-                "context": "This helps me tailor advice to your life stage.",
-                "suggested_type": "number"
-            },
-            "gender": {
-                "question": "How do you identify?",
-                "context": "This helps personalize your experience.",
-                "suggested_type": "select",
-                "options": ["Male", "Female", "Non-binary", "Prefer not to say"]
-            },
-            "year_in_school": {
-                "question": "What year are you in school?",
-                "context": "Different years come with different financial challenges.",
-                "suggested_type": "select",
-                "options": ["Freshman", "Sophomore", "Junior", "Senior", "Graduate"]
-            },
-            "major": {
-                "question": "What are you studying?",
-                "context": "Your major can affect both expenses and future income.",
-                "suggested_type": "text"
-            },
-            "monthly_income": {
-                "question": "How much money do you bring in each month?",
-                "context": "Include jobs, allowances, gig work—everything that comes in regularly.",
-                "suggested_type": "number"
-            },
-            "financial_aid": {
-                "question": "Do you receive any financial aid? How much per month?",
-                "context": "Include scholarships, grants, and any loan money you use for living expenses.",
-                "suggested_type": "number"
-            },
-            "tuition": {
-                "question": "What's your monthly tuition cost?",
-                "context": "If you pay per semester, just divide by the number of months.",
-                "suggested_type": "number"
-            },
-            "housing": {
-                "question": "How much do you spend on housing each month?",
-                "context": "Include rent, utilities, internet—the whole package.",
-                "suggested_type": "number"
-            },
-            "food": {
-                "question": "What about food? How much do you typically spend monthly?",
-                "context": "Groceries, meal plans, dining out, coffee runs—all of it counts!",
-                "suggested_type": "number"
-            },
-            "transportation": {
-                "question": "How much do you spend getting around?",
-                "context": "Gas, public transit, rideshares, bike maintenance—whatever you use.",
-                "suggested_type": "number"
-            },
-            "books_supplies": {
-                "question": "What do books and supplies cost you monthly?",
-                "context": "Textbooks, lab materials, school supplies. If it varies, give me an average.",
-                "suggested_type": "number"
-            },
-            "entertainment": {
-                "question": "Now for the fun stuff—how much goes to entertainment?",
-                "context": "Streaming, games, concerts, nights out with friends.",
-                "suggested_type": "number"
-            },
-            "personal_care": {
-                "question": "What about personal care and self-maintenance?",
-                "context": "Haircuts, skincare, gym, clothes—taking care of yourself.",
-                "suggested_type": "number"
-            },
-            "technology": {
-                "question": "Any regular technology expenses?",
-                "context": "Phone plan, app subscriptions, software you need.",
-                "suggested_type": "number"
-            },
-            "health_wellness": {
-                "question": "What do you spend on health and wellness?",
-                "context": "Insurance, medications, therapy, doctor visits.",
-                "suggested_type": "number"
-            },
-            "miscellaneous": {
-                "question": "Anything else we haven't covered?",
-                "context": "Gifts, random purchases, unexpected expenses—the stuff that doesn't fit elsewhere.",
-                "suggested_type": "number"
-            },
-            "preferred_payment_method": {
-                "question": "Last one! How do you usually pay for things?",
-                "context": "This tells me a bit about your spending habits.",
-                "suggested_type": "select",
-                "options": ["Cash", "Credit Card", "Debit Card", "Mobile Payment (Venmo, Apple Pay, etc.)"]
-            }
-        }
-
-        q = questions.get(next_field, {
+        q = MOCK_QUESTIONS.get(next_field) or {
             "question": f"Tell me about your {next_field.replace('_', ' ')}",
             "context": None,
             "suggested_type": "text"
-        })
+        }
 
         return {
             "field": next_field,
@@ -187,31 +212,10 @@ class ClaudeSurveyService:
             "is_complete": False,
             "suggested_type": q["suggested_type"],
             "options": q.get("options"),
-            "progress": len(collected_fields) / len(required)
+            # Only count answers this flow asks for
+            "progress": len(required_set & collected_fields) / len(required)
         }
 
     def _get_survey_prompt(self) -> str:
         """Get the system prompt for generating survey questions."""
-        return """You are a friendly financial coach collecting information from a college student. Your goal is to gather their financial data through a natural, conversational flow.
-
-Based on the conversation so far, generate the next question to ask. Be:
-- Warm and conversational, not robotic
-- Brief but clear
-- Encouraging when appropriate
-
-You need to collect these fields (mark which ones you've already gotten):
-- age, gender, year_in_school, major
-- monthly_income, financial_aid
-- tuition, housing, food, transportation
-- books_supplies, entertainment, personal_care
-- technology, health_wellness, miscellaneous
-- preferred_payment_method
-
-Return JSON with:
-{
-  "field": "the_field_being_asked",
-  "question": "Your conversational question",
-  "context": "Optional helper text",
-  "suggested_type": "number|text|select",
-  "options": ["only", "for", "select", "types"]
-}"""
+        return SURVEY_PROMPT
@@ -1,16 +1,267 @@
-import json
+import re
+import asyncio
 import logging
-import anthropic
+from collections.abc import AsyncIterator
 from ..schemas.teacher import TeacherOutput, LessonOutline, FieldUpdate
 from ..schemas.intake import SnapshotData
 from ..schemas.ml import MLOutput
 from ..schemas.dashboard import Analytics
 from ..config import get_settings
-from .claude_safety import safety_guard
+from .claude_safety import NUMERIC_FIELDS, add_safety_context, check_output_safety, log_interaction, sanitize_user_input, validate_financial_data
+from .anthropic_client import get_client, claude_rate_limiter, claude_semaphore, cached_system, log_cache_usage
+from .claude_summarizer import YEAR_NAMES
+from .claude_survey import FINANCIAL_FIELDS
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Written flush-left so no indentation is sent to (and billed by) the API
+TEACHER_PROMPT = """You are a supportive financial micro-coach for college students. Your role is to deliver bite-sized financial EDUCATION through personalized lessons that explain WHY concepts matter and HOW to apply them.
+
+CRITICAL TONE GUIDELINES:
+- Supportive and encouraging—like a helpful peer, not a parent or authority figure
+- Non-judgmental—no shame, criticism, or moralizing about spending choices
+- Practical and student-friendly—real-world tips that work for student life
+- Emotionally neutral—calm and reassuring, never alarming or overwhelming
+- Light motivational framing—focus on small wins and progress, not perfection
+- Accessible—avoid jargon, keep explanations simple and relatable
+
+IMPORTANT BOUNDARIES:
+- NO investment advice (stocks, crypto, retirement accounts)
+- NO tax advice
+- NO legal claims or debt negotiation strategies
+- Focus on budgeting awareness, spending habits, SAVINGS, and basic financial literacy
+
+KEY CONCEPT: SAVINGS AWARENESS
+Always consider their savings potential:
+- If net balance is positive: they have savings potential—celebrate and suggest building a buffer
+- If net balance is negative: focus on reducing the gap first, savings comes later
+- Emergency fund concept: even $50-100 set aside helps (explain why: unexpected expenses happen)
+- The psychological benefit of having ANY cushion, even small
+
+RESPONSE TYPES - Detect the student's intent:
+1. "coaching" - They're asking for help/advice → Give actions + EDUCATIONAL lesson
+2. "feedback" - They're reporting what they did → Give encouragement, NO new actions
+3. "update" - They're reporting a specific number change → Extract the update, give feedback
+
+FIELD UPDATES - If the student mentions a specific spending/income change, extract it:
+Valid fields: monthly_income, financial_aid, tuition, housing, food, transportation, books_supplies, entertainment, personal_care, technology, health_wellness, miscellaneous
+
+CRITICAL: All values must be MONTHLY amounts. Convert if needed:
+- Weekly amount × 4 = monthly (e.g., $50/week → 200)
+- Yearly amount ÷ 12 = monthly (e.g., $12,000/year → 1000)
+- Semester amount ÷ 4 = monthly (e.g., $2000/semester → 500)
+- One-time amounts: Ask for clarification or assume it's this month's total
+
+Examples of updates to detect:
+- "I spent $350 on food this month" → field_updates: [{"field": "food", "value": 350}]
+- "My entertainment was only $80" → field_updates: [{"field": "entertainment", "value": 80}]
+- "I got a raise, now making $1500/month" → field_updates: [{"field": "monthly_income", "value": 1500}]
+- "I make $24,000 a year" → field_updates: [{"field": "monthly_income", "value": 2000}]
+- "I spend about $100 a week on food" → field_updates: [{"field": "food", "value": 400}]
+
+If the time period is ambiguous (e.g., "I earned $6000"), ask for clarification in your explanation before extracting the update. Don't guess.
+
+Create a response with:
+1. response_type: "coaching" | "feedback" | "update"
+
+2. priority_issues: Array of 1-3 issue codes
+   - Use codes like: "tight_budget", "high_food_spend", "no_savings_buffer", "spending_exceeds_income", "building_good_habits", "progress_made", "savings_opportunity"
+
+3. explanation: 1-2 short paragraphs
+   - For coaching: Explain their situation + context, including savings angle
+   - For feedback: Acknowledge what they did + encourage them
+   - For update: Acknowledge the change + what it means for their picture
+
+4. actions_for_week: Array of 0-3 actions
+   - For coaching: 1-3 specific, bite-sized actions (include savings-related when relevant)
+   - For feedback: Empty array [] - they just told you what they did, don't pile on more
+   - For update: Maybe 0-1 actions related to the update, or empty
+
+5. lesson_outline: Educational mini-lesson that teaches a CONCEPT (required for coaching)
+   - title: The concept being taught
+   - bullet_points: 2-4 points that explain WHY this matters and HOW it works
+
+   LESSON TOPICS TO COVER (rotate based on relevance):
+   - "Why Emergency Funds Matter": Unexpected costs, peace of mind, avoiding debt
+   - "The 50/30/20 Rule": Needs vs wants vs savings breakdown
+   - "Small Amounts Add Up": $5/day = $150/month, compound effect
+   - "Lifestyle Creep": Why spending rises with income, how to prevent it
+   - "The True Cost of Subscriptions": Monthly fees that sneak up
+   - "Meal Planning Basics": How planning saves money and time
+   - "The Psychology of Spending": Emotional triggers, impulse buying
+   - "Building Money Habits": Why automation and routine help
+
+   BAD lessons (too vague, just tips):
+   - "Quick Tip" with "Track your spending" - not educational
+   - "Budgeting Basics" with "Make a budget" - not explaining WHY
+
+   GOOD lessons (teach concepts):
+   - "Why Small Savings Matter" with:
+     - "Even $25/week becomes $100/month—that's a surprise car repair covered"
+     - "Having ANY buffer reduces financial stress significantly"
+     - "It's not about the amount, it's about building the habit"
+
+6. field_updates: Array of detected updates from their message
+   - Each update: {"field": "field_name", "value": number}
+   - Empty array [] if no specific numbers mentioned
+
+Record these six fields with the emit_coaching tool."""
+
+
+# Static part of every teacher request, safety footer included. It goes out
+# as a cached system block so only the snapshot and message are sent fresh.
+TEACHER_SYSTEM = add_safety_context(
+    TEACHER_PROMPT
+    + "\n\nGenerate a supportive, non-judgmental response with bite-sized coaching. "
+    "Remember: warm tone, small achievable actions, no investment/tax/legal advice."
+)
+
+# Claude answers through this tool, so the reply arrives as JSON already
+# parsed against the TeacherOutput schema instead of text to dig it out of
+TEACHER_TOOL = {
+    "name": "emit_coaching",
+    "description": "Record the coaching response for the student.",
+    "input_schema": TeacherOutput.model_json_schema(),
+}
+
+# Snapshot fields validate_financial_data reads, pulled off the model
+# directly rather than dumping every field on each request
+VALIDATED_FIELDS = (*NUMERIC_FIELDS, "age")
+
+# Fields the teacher may update from what the student says
+UPDATABLE_FIELDS = frozenset(FINANCIAL_FIELDS)
+
+# Fields a reply has to carry before it is worth showing
+REQUIRED_REPLY_FIELDS = ("response_type", "priority_issues", "explanation")
+
+
+# Per-turn context, filled from the snapshot, analytics and ML output
+CONTEXT_TMPL = """Current Financial Snapshot:
+- Age: {age}
+- Year: {year_name}
+- Monthly Income: ${monthly_income}
+- Financial Aid: ${financial_aid}
+
+Monthly Expenses:
+- Tuition: ${tuition}
+- Housing: ${housing}
+- Food: ${food}
+- Transportation: ${transportation}
+- Books/Supplies: ${books_supplies}
+- Entertainment: ${entertainment}
+- Personal Care: ${personal_care}
+- Technology: ${technology}
+- Health/Wellness: ${health_wellness}
+- Miscellaneous: ${miscellaneous}
+
+Analytics:
+- Total Resources: ${total_resources}
+- Total Spending: ${total_spending}
+- Net Balance: ${net_balance}
+- Food Share: {food_share:.1%}
+- Entertainment Share: {entertainment_share:.1%}
+- Discretionary Share: {discretionary_share:.1%}
+
+Risk Assessment:
+- Overspending Probability: {overspending_prob:.1%}
+- Financial Stress Probability: {financial_stress_prob:.1%}"""
+
+# Appended when there is an earlier check-in to compare against
+CHANGES_TMPL = """
+
+Changes from Previous Check-in:
+- Income Change: ${income_change:+}
+- Spending Change: ${spending_change:+}
+- Balance Change: ${balance_change:+}"""
+
+# Whole user turn: the context above, then what the student said
+USER_PROMPT_TMPL = """{context}
+
+Student's Message: "{user_message}\""""
+
+
+# Where the explanation string starts in the streamed tool input
+EXPLANATION_START_RE = re.compile(r'"explanation"\s*:\s*"')
+# Single-character JSON escapes (\uXXXX is handled separately)
+JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class _ExplanationReader:
+    """
+    Decode the explanation string out of emit_coaching input fragments as
+    they arrive. Each fragment is scanned once, so following a reply is
+    linear in its length rather than a re-parse per fragment.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._state = "seek"  # "seek" -> "value" -> "done"
+
+    def feed(self, fragment: str) -> str:
+        """Add the next fragment; return explanation text completed by it."""
+        if self._state == "done":
+            return ""
+        self._buf += fragment
+
+        if self._state == "seek":
+            match = EXPLANATION_START_RE.search(self._buf, self._pos)
+            if match is None:
+                # Keep a tail in case the key is split across fragments
+                self._pos = max(self._pos, len(self._buf) - 32)
+                return ""
+            self._state = "value"
+            self._pos = match.end()
+
+        buf, pos, out = self._buf, self._pos, []
+        while pos < len(buf):
+            char = buf[pos]
+            if char == '"':
+                self._state = "done"
+                break
+            if char != "\\":
+                out.append(char)
+                pos += 1
+                continue
+            if pos + 1 >= len(buf):
+                break
+            code = buf[pos + 1]
+            if code != "u":
+                out.append(JSON_ESCAPES.get(code, code))
+                pos += 2
+                continue
+            if pos + 6 > len(buf):
+                break
+            unit = int(buf[pos + 2:pos + 6], 16)
+            if 0xD800 <= unit < 0xDC00 and buf[pos + 6:pos + 8] in ("\\u", "\\", ""):
+                # High surrogate; wait for its low half
+                if pos + 12 > len(buf):
+                    break
+                low = int(buf[pos + 8:pos + 12], 16)
+                out.append(chr(0x10000 + ((unit - 0xD800) << 10) + (low - 0xDC00)))
+                pos += 12
+            else:
+                out.append(chr(unit))
+                pos += 6
+        self._pos = pos
+        return "".join(out)
+
+
+def _reply_texts(parsed: dict):
+    """Yield each prose string of an emit_coaching input separately."""
+    yield parsed.get("explanation")
+    for key in ("priority_issues", "actions_for_week"):
+        items = parsed.get(key)
+        if isinstance(items, list):
+            yield from items
+    lesson = parsed.get("lesson_outline")
+    if isinstance(lesson, dict):
+        yield lesson.get("title")
+        bullets = lesson.get("bullet_points")
+        if isinstance(bullets, list):
+            yield from bullets
+
 
 class ClaudeTeacherService:
     """
@@ -20,7 +271,7 @@ class ClaudeTeacherService:
 
     def __init__(self):
         self.api_key = settings.anthropic_api_key
-        self.client = anthropic.Anthropic(api_key=self.api_key) if self.api_key else None
+        self.client = get_client()
 
     async def generate_response(
         self,
@@ -36,11 +287,11 @@ class ClaudeTeacherService:
         Uses Claude API for intelligent coaching.
         """
         # Sanitize user input
-        safe_message = safety_guard.sanitize_user_input(user_message)
+        safe_message = sanitize_user_input(user_message)
 
         # Validate financial data
-        input_data = snapshot.model_dump() if hasattr(snapshot, 'model_dump') else snapshot.__dict__
-        is_valid, error = safety_guard.validate_financial_data(input_data)
+        input_data = {f: getattr(snapshot, f) for f in VALIDATED_FIELDS}
+        is_valid, error = validate_financial_data(input_data)
         if not is_valid:
             logger.error(f"Invalid financial data: {error}")
             return self._generate_fallback_response(
@@ -51,15 +302,15 @@ class ClaudeTeacherService:
         # Try Claude API first, fall back to minimal response if unavailable
         if self.client and self.api_key:
             try:
-                result = self._respond_with_claude(
+                result = await self._respond_with_claude(
                     snapshot, ml_output, analytics, safe_message,
                     previous_snapshot, previous_analytics
                 )
-                safety_guard.log_interaction("teacher", safe_message[:50], result.explanation[:50], True)
+                log_interaction("teacher", safe_message[:50], result.explanation[:50], True)
                 return result
             except Exception as e:
                 logger.error(f"Claude teacher response failed: {e}")
-                safety_guard.log_interaction("teacher", safe_message[:50], str(e), False)
+                log_interaction("teacher", safe_message[:50], str(e), False)
                 return self._generate_fallback_response(
                     snapshot, ml_output, analytics, safe_message,
                     previous_snapshot, previous_analytics
@@ -70,7 +321,7 @@ class ClaudeTeacherService:
                 previous_snapshot, previous_analytics
             )
 
-    def _respond_with_claude(
+    async def generate_response_stream(
         self,
         snapshot: SnapshotData,
         ml_output: MLOutput,
@@ -78,105 +329,175 @@ class ClaudeTeacherService:
         user_message: str,
         previous_snapshot: SnapshotData | None = None,
         previous_analytics: Analytics | None = None
-    ) -> TeacherOutput:
-        """Use Claude to generate a personalized teacher response."""
-        # Prepare the context for Claude
-        context = f"""Current Financial Snapshot:
-                    - Age: {snapshot.age}
-                    - Year: {["Freshman", "Sophomore", "Junior", "Senior", "Graduate"][snapshot.year_in_school]}
-                    - Monthly Income: ${snapshot.monthly_income}
-                    - Financial Aid: ${snapshot.financial_aid}
-                    
-                    Monthly Expenses:
-                    - Tuition: ${snapshot.tuition}
-                    - Housing: ${snapshot.housing}
-                    - Food: ${snapshot.food}
-                    - Transportation: ${snapshot.transportation}
-                    - Books/Supplies: ${snapshot.books_supplies}
-                    - Entertainment: ${snapshot.entertainment}
-                    - Personal Care: ${snapshot.personal_care}
-                    - Technology: ${snapshot.technology}
-                    - Health/Wellness: ${snapshot.health_wellness}
-                    - Miscellaneous: ${snapshot.miscellaneous}
-                    
-                    Analytics:
-                    - Total Resources: ${analytics.total_resources}
-                    - Total Spending: ${analytics.total_spending}
-                    - Net Balance: ${analytics.net_balance}
-                    - Food Share: {analytics.food_share * 100:.1f}%
-                    - Entertainment Share: {analytics.entertainment_share * 100:.1f}%
-                    - Discretionary Share: {analytics.discretionary_share * 100:.1f}%
-                    
-                    Risk Assessment:
-                    - Overspending Probability: {ml_output.overspending_prob * 100:.1f}%
-                    - Financial Stress Probability: {ml_output.financial_stress_prob * 100:.1f}%"""
+    ) -> AsyncIterator[tuple[str, str | TeacherOutput]]:
+        """
+        Stream a teacher response as Claude generates it.
 
-        # Add comparison with previous snapshot if available
-        if previous_snapshot and previous_analytics:
-            income_change = snapshot.monthly_income - previous_snapshot.monthly_income
-            spending_change = analytics.total_spending - previous_analytics.total_spending
-            balance_change = analytics.net_balance - previous_analytics.net_balance
-
-            context += f"""
-                        
-                        Changes from Previous Check-in:
-                        - Income Change: ${income_change:+}
-                        - Spending Change: ${spending_change:+}
-                        - Balance Change: ${balance_change:+}"""
-
-            base_prompt = f"""{self._get_teacher_prompt()}
-    
-                        {context}
-                        
-                        Student's Message: "{user_message}"
-                        
-                        Generate a supportive, non-judgmental response with bite-sized coaching. Remember: warm tone, small achievable actions, no investment/tax/legal advice. Return ONLY a valid JSON object."""
+        Yields ("delta", text) for each new piece of the reply's explanation
+        as Claude writes it, then exactly one ("done", TeacherOutput) once
+        the full reply has been checked. The final output is what gets
+        stored, so clients should render it in place of the streamed text
+        (it is the fallback if the reply fails the safety or format checks).
+        """
+        safe_message = sanitize_user_input(user_message)
+        fallback_args = (
+            snapshot, ml_output, analytics, safe_message,
+            previous_snapshot, previous_analytics
+        )
 
+        input_data = {f: getattr(snapshot, f) for f in VALIDATED_FIELDS}
+        is_valid, error = validate_financial_data(input_data)
+        if not is_valid:
+            logger.error(f"Invalid financial data: {error}")
+            yield "done", self._generate_fallback_response(*fallback_args)
+            return
+
+        if not (self.client and self.api_key):
+            yield "done", self._generate_fallback_response(*fallback_args)
+            return
+
+        user_prompt = self._build_user_prompt(*fallback_args)
+        # A separate task reads the reply, so only the upstream read holds a
+        # Claude concurrency slot, never a slow client draining the deltas
+        deltas: asyncio.Queue[str | None] = asyncio.Queue()
+        reader = asyncio.create_task(self._stream_with_claude(user_prompt, deltas))
+        try:
+            while (text := await deltas.get()) is not None:
+                yield "delta", text
+            message = await reader
+            log_cache_usage("teacher", message)
+            result = self._parse_reply(message.content[0].input)
+        except Exception as e:
+            logger.error(f"Claude teacher stream failed: {e}")
+            log_interaction("teacher", safe_message[:50], str(e), False)
+            yield "done", self._generate_fallback_response(*fallback_args)
+            return
+        finally:
+            # Only matters if the client went away mid-reply: stop reading
+            reader.cancel()
+
+        if result is None:
+            result = self._generate_fallback_response(*fallback_args)
         else:
-            base_prompt = f"""{self._get_teacher_prompt()}
-    
-                        {context}
-                        
-                        Student's Message: "{user_message}"
-                        
-                        Generate a supportive, non-judgmental response with bite-sized coaching. Remember: warm tone, small achievable actions, no investment/tax/legal advice. Return ONLY a valid JSON object."""
-
-        # Add safety context
-        prompt = safety_guard.add_safety_context(base_prompt)
-
-        message = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1500,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+            log_interaction("teacher", safe_message[:50], result.explanation[:50], True)
+        yield "done", result
+
+    async def _stream_with_claude(self, user_prompt: str, deltas: asyncio.Queue):
+        """
+        Stream the tool call, putting explanation text on deltas as it
+        arrives and None when the stream ends. Returns the final message.
+        """
+        try:
+            async with claude_rate_limiter, claude_semaphore:
+                async with self.client.messages.stream(
+                    model="claude-sonnet-4-20250514",
+                    max_tokens=1500,
+                    system=cached_system(TEACHER_SYSTEM),
+                    messages=[
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    tools=[TEACHER_TOOL],
+                    tool_choice={"type": "tool", "name": TEACHER_TOOL["name"]}
+                ) as stream:
+                    # The tool input arrives as JSON fragments; only the
+                    # explanation is prose a client can show while it grows
+                    explanation = _ExplanationReader()
+                    async for event in stream:
+                        if event.type == "input_json":
+                            text = explanation.feed(event.partial_json)
+                            if text:
+                                deltas.put_nowait(text)
+                    return await stream.get_final_message()
+        finally:
+            deltas.put_nowait(None)
+
+    async def _respond_with_claude(
+        self,
+        snapshot: SnapshotData,
+        ml_output: MLOutput,
+        analytics: Analytics,
+        user_message: str,
+        previous_snapshot: SnapshotData | None = None,
+        previous_analytics: Analytics | None = None
+    ) -> TeacherOutput:
+        """Use Claude to generate a personalized teacher response."""
+        user_prompt = self._build_user_prompt(
+            snapshot, ml_output, analytics, user_message,
+            previous_snapshot, previous_analytics
         )
 
-        # Extract JSON from response
-        response_text = message.content[0].text.strip()
+        async with claude_rate_limiter, claude_semaphore:
+            message = await self.client.messages.create(
+                model="claude-sonnet-4-20250514",
+                max_tokens=1500,
+                system=cached_system(TEACHER_SYSTEM),
+                messages=[
+                    {"role": "user", "content": user_prompt}
+                ],
+                tools=[TEACHER_TOOL],
+                tool_choice={"type": "tool", "name": TEACHER_TOOL["name"]}
+            )
+        log_cache_usage("teacher", message)
 
-        # Validate output safety
-        is_safe, warning = safety_guard.check_output_safety(response_text)
-        if not is_safe:
-            logger.warning(f"Unsafe output detected: {warning}")
+        # The forced tool call is the only content block
+        result = self._parse_reply(message.content[0].input)
+        if result is None:
             return self._generate_fallback_response(
                 snapshot, ml_output, analytics, user_message,
                 previous_snapshot, previous_analytics
             )
+        return result
 
-        # Validate JSON response - only require core fields
-        is_valid, parsed, error = safety_guard.validate_json_response(
-            response_text,
-            ["response_type", "priority_issues", "explanation"]
-        )
+    def _build_user_prompt(
+        self,
+        snapshot: SnapshotData,
+        ml_output: MLOutput,
+        analytics: Analytics,
+        user_message: str,
+        previous_snapshot: SnapshotData | None = None,
+        previous_analytics: Analytics | None = None
+    ) -> str:
+        """Build the per-turn user message: the snapshot context plus the student's message."""
+        # Prepare the context for Claude
+        # Out-of-range years from bad intake data get a neutral label
+        # rather than an IndexError that skips the fallback response
+        year = snapshot.year_in_school
+        values = {
+            **snapshot.model_dump(),
+            **analytics.model_dump(),
+            **ml_output.model_dump(),
+            "year_name": YEAR_NAMES[year] if 0 <= year < len(YEAR_NAMES) else "Student",
+        }
+        context = CONTEXT_TMPL.format_map(values)
 
-        if not is_valid:
-            logger.error(f"Invalid response format: {error}")
-            return self._generate_fallback_response(
-                snapshot, ml_output, analytics, user_message,
-                previous_snapshot, previous_analytics
+        # Add comparison with previous snapshot if available
+        if previous_snapshot and previous_analytics:
+            context += CHANGES_TMPL.format(
+                income_change=snapshot.monthly_income - previous_snapshot.monthly_income,
+                spending_change=analytics.total_spending - previous_analytics.total_spending,
+                balance_change=analytics.net_balance - previous_analytics.net_balance
             )
 
+        return USER_PROMPT_TMPL.format(context=context, user_message=user_message)
+
+    def _parse_reply(self, parsed: dict) -> TeacherOutput | None:
+        """Check and parse Claude's tool input; None means the caller should fall back."""
+        # Validate output safety one field at a time, so an advice phrase in
+        # one field isn't matched against a topic word in another
+        for text in _reply_texts(parsed):
+            if not isinstance(text, str):
+                continue
+            is_safe, warning = check_output_safety(text)
+            if not is_safe:
+                logger.warning(f"Unsafe output detected: {warning}")
+                return None
+
+        # Only require core fields
+        missing = [f for f in REQUIRED_REPLY_FIELDS if f not in parsed]
+        if missing:
+            logger.error(f"Invalid response format: Missing fields: {', '.join(missing)}")
+            return None
+
         # Parse lesson_outline if present
         lesson = None
         if parsed.get("lesson_outline") and isinstance(parsed["lesson_outline"], dict):
@@ -185,15 +506,18 @@ class ClaudeTeacherService:
                 bullet_points=parsed["lesson_outline"].get("bullet_points", [])
             )
 
-        # Parse field_updates if present
-        field_updates = []
-        if parsed.get("field_updates") and isinstance(parsed["field_updates"], list):
-            for update in parsed["field_updates"]:
-                if isinstance(update, dict) and "field" in update and "value" in update:
-                    field_updates.append(FieldUpdate(
-                        field=update["field"],
-                        value=update["value"]
-                    ))
+        # Parse field_updates if present; entries are checked here, so the
+        # models are built without another validation pass
+        raw_updates = parsed.get("field_updates")
+        if not isinstance(raw_updates, list):
+            raw_updates = []
+        field_updates = [
+            FieldUpdate.model_construct(field=u["field"], value=u["value"])
+            for u in raw_updates
+            if isinstance(u, dict)
+            and u.get("field") in UPDATABLE_FIELDS
+            and type(u.get("value")) in (int, float)
+        ]
 
         return TeacherOutput(
             response_type=parsed.get("response_type", "coaching"),
@@ -206,6 +530,12 @@ class ClaudeTeacherService:
 
     def _generate_fallback_response(
         self,
+        snapshot: SnapshotData,
+        ml_output: MLOutput,
+        analytics: Analytics,
+        user_message: str,
+        previous_snapshot: SnapshotData | None = None,
+        previous_analytics: Analytics | None = None
     ) -> TeacherOutput:
         """Generate a minimal fallback when Claude API is unavailable."""
         return TeacherOutput(
@@ -217,97 +547,3 @@ class ClaudeTeacherService:
                 bullet_points=["Tracking spending is the first step to awareness"]
             )
         )
-
-    def _get_teacher_prompt(self) -> str:
-        """Get the system prompt for the teacher agent."""
-        return """You are a supportive financial micro-coach for college students. Your role is to deliver bite-sized financial EDUCATION through personalized lessons that explain WHY concepts matter and HOW to apply them.
-                
-                CRITICAL TONE GUIDELINES:
-                - Supportive and encouraging—like a helpful peer, not a parent or authority figure
-                - Non-judgmental—no shame, criticism, or moralizing about spending choices
-                - Practical and student-friendly—real-world tips that work for student life
-                - Emotionally neutral—calm and reassuring, never alarming or overwhelming
-                - Light motivational framing—focus on small wins and progress, not perfection
-                - Accessible—avoid jargon, keep explanations simple and relatable
-                
-                IMPORTANT BOUNDARIES:
-                - NO investment advice (stocks, crypto, retirement accounts)
-                - NO tax advice
-                - NO legal claims or debt negotiation strategies
-                - Focus on budgeting awareness, spending habits, SAVINGS, and basic financial literacy
-                
-                KEY CONCEPT: SAVINGS AWARENESS
-                Always consider their savings potential:
-                - If net balance is positive: they have savings potential—celebrate and suggest building a buffer
-                - If net balance is negative: focus on reducing the gap first, savings comes later
-                - Emergency fund concept: even $50-100 set aside helps (explain why: unexpected expenses happen)
-                - The psychological benefit of having ANY cushion, even small
-                
-                RESPONSE TYPES - Detect the student's intent:
-                1. "coaching" - They're asking for help/advice → Give actions + EDUCATIONAL lesson
-                2. "feedback" - They're reporting what they did → Give encouragement, NO new actions
-                3. "update" - They're reporting a specific number change → Extract the update, give feedback
-                
-                FIELD UPDATES - If the student mentions a specific spending/income change, extract it:
-                Valid fields: monthly_income, financial_aid, tuition, housing, food, transportation, books_supplies, entertainment, personal_care, technology, health_wellness, miscellaneous
-                
-                CRITICAL: All values must be MONTHLY amounts. Convert if needed:
-                - Weekly amount × 4 = monthly (e.g., $50/week → 200)
-                - Yearly amount ÷ 12 = monthly (e.g., $12,000/year → 1000)
-                - Semester amount ÷ 4 = monthly (e.g., $2000/semester → 500)
-                - One-time amounts: Ask for clarification or assume it's this month's total
-                
-                Examples of updates to detect:
-                - "I spent $350 on food this month" → field_updates: [{"field": "food", "value": 350}]
-                - "My entertainment was only $80" → field_updates: [{"field": "entertainment", "value": 80}]
-                - "I got a raise, now making $1500/month" → field_updates: [{"field": "monthly_income", "value": 1500}]
-                - "I make $24,000 a year" → field_updates: [{"field": "monthly_income", "value": 2000}]
-                - "I spend about $100 a week on food" → field_updates: [{"field": "food", "value": 400}]
-                
-                If the time period is ambiguous (e.g., "I earned $6000"), ask for clarification in your explanation before extracting the update. Don't guess.
-                
-                Create a response with:
-                1. response_type: "coaching" | "feedback" | "update"
-                
-                2. priority_issues: Array of 1-3 issue codes
-                   - Use codes like: "tight_budget", "high_food_spend", "no_savings_buffer", "spending_exceeds_income", "building_good_habits", "progress_made", "savings_opportunity"
-                
-                3. explanation: 1-2 short paragraphs
-                   - For coaching: Explain their situation + context, including savings angle
-                   - For feedback: Acknowledge what they did + encourage them
-                   - For update: Acknowledge the change + what it means for their picture
-                
-                4. actions_for_week: Array of 0-3 actions
-                   - For coaching: 1-3 specific, bite-sized actions (include savings-related when relevant)
-                   - For feedback: Empty array [] - they just told you what they did, don't pile on more
-                   - For update: Maybe 0-1 actions related to the update, or empty
-                
-                5. lesson_outline: Educational mini-lesson that teaches a CONCEPT (required for coaching)
-                   - title: The concept being taught
-                   - bullet_points: 2-4 points that explain WHY this matters and HOW it works
-                
-                   LESSON TOPICS TO COVER (rotate based on relevance):
-                   - "Why Emergency Funds Matter": Unexpected costs, peace of mind, avoiding debt
-                   - "The 50/30/20 Rule": Needs vs wants vs savings breakdown
-                   - "Small Amounts Add Up": $5/day = $150/month, compound effect
-                   - "Lifestyle Creep": Why spending rises with income, how to prevent it
-                   - "The True Cost of Subscriptions": Monthly fees that sneak up
-                   - "Meal Planning Basics": How planning saves money and time
-                   - "The Psychology of Spending": Emotional triggers, impulse buying
-                   - "Building Money Habits": Why automation and routine help
-                
-                   BAD lessons (too vague, just tips):
-                   - "Quick Tip" with "Track your spending" - not educational
-                   - "Budgeting Basics" with "Make a budget" - not explaining WHY
-                
-                   GOOD lessons (teach concepts):
-                   - "Why Small Savings Matter" with:
-                     - "Even $25/week becomes $100/month—that's a surprise car repair covered"
-                     - "Having ANY buffer reduces financial stress significantly"
-                     - "It's not about the amount, it's about building the habit"
-                
-                6. field_updates: Array of detected updates from their message
-                   - Each update: {"field": "field_name", "value": number}
-                   - Empty array [] if no specific numbers mentioned
-                
-                Return ONLY a valid JSON object with these six fields."""
@@ -1,9 +1,11 @@
 import os
-import random
+import asyncio
+import contextlib
 import math
-import joblib
-import pandas as pd
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
 from pathlib import Path
+import numpy as np
 from ..schemas.ml import MLInput, MLOutput
 from ..config import get_settings
 
@@ -13,15 +15,134 @@ settings = get_settings()
 MODEL_DIR = Path(__file__).parent.parent / "ml_models"
 STRESS_MODEL_PATH = MODEL_DIR / "financial_stress_model.joblib"
 OVERSPENDING_MODEL_PATH = MODEL_DIR / "overspending_model.joblib"
+# ONNX exports of the same pipelines (written by train_models.py)
+STRESS_ONNX_PATH = MODEL_DIR / "financial_stress_model.onnx"
+OVERSPENDING_ONNX_PATH = MODEL_DIR / "overspending_model.onnx"
 
-# Mappings from integer codes to string values expected by the model
-GENDER_MAP = {0: "Male", 1: "Female", 2: "Non-binary", 3: "Non-binary"}
-YEAR_MAP = {0: "Freshman", 1: "Sophomore", 2: "Junior", 3: "Senior", 4: "Graduate"}
-MAJOR_MAP = {
-    0: "Computer Science", 1: "Business", 2: "English", 3: "Psychology",
-    4: "Art", 5: "Biology", 6: "Education", 7: "Law", 8: "Economics"
-}
-PAYMENT_MAP = {0: "Cash", 1: "Credit/Debit Card", 2: "Credit/Debit Card", 3: "Mobile Payment App"}
+# String values expected by the model, indexed by integer code
+GENDER_NAMES = ("Male", "Female", "Non-binary", "Non-binary")
+YEAR_NAMES = ("Freshman", "Sophomore", "Junior", "Senior", "Graduate")
+MAJOR_NAMES = (
+    "Computer Science", "Business", "English", "Psychology",
+    "Art", "Biology", "Education", "Law", "Economics"
+)
+PAYMENT_NAMES = ("Cash", "Credit/Debit Card", "Credit/Debit Card", "Mobile Payment App")
+
+# Feature columns in the order the training DataFrame used them
+CATEGORICAL_FEATURES = ("gender", "year_in_school", "major", "preferred_payment_method")
+NUMERICAL_FEATURES = (
+    "age", "monthly_income", "financial_aid", "tuition", "housing", "food",
+    "transportation", "books_supplies", "entertainment", "personal_care",
+    "technology", "health_wellness", "miscellaneous"
+)
+FEATURE_COLUMNS = CATEGORICAL_FEATURES + NUMERICAL_FEATURES
+
+# Reads all numerical features off an MLInput as a tuple in one call
+_get_numerical = attrgetter(*NUMERICAL_FEATURES)
+
+# Overspending dollars → probability via a logistic sigmoid.
+# Scale factor of 400 means more conservative estimates:
+# - $0 overspending → ~50% probability
+# - $200 overspending → ~62% probability
+# - $400 overspending → ~73% probability
+# - $800 overspending → ~88% probability (capped, see below)
+# - Negative values (underspending) → lower probabilities
+OVERSPENDING_SCALE = 400.0
+# Clamp to reasonable bounds - cap at 85% to avoid overstating
+OVERSPENDING_PROB_FLOOR = 0.05
+OVERSPENDING_PROB_CAP = 0.85
+# Dollar amounts where the sigmoid reaches those bounds (its inverse)
+OVERSPENDING_RAW_FLOOR = -OVERSPENDING_SCALE * math.log(1 / OVERSPENDING_PROB_FLOOR - 1)
+OVERSPENDING_RAW_CAP = -OVERSPENDING_SCALE * math.log(1 / OVERSPENDING_PROB_CAP - 1)
+
+# Rule tables for the mock predictor. bisect_right on a step list picks the
+# band for ">= step" rules and bisect_left for "> step" rules, so each
+# ladder is one lookup rather than a chain of comparisons.
+# Spending/income ratio (>=): <0.9, 0.9, 1.0, 1.1, 1.3+
+SPENDING_RATIO_STEPS = (0.9, 1.0, 1.1, 1.3)
+SPENDING_RATIO_BASES = (0.1, 0.2, 0.35, 0.5, 0.7)
+# Discretionary/income ratio (>): up to 0.2, up to 0.3, above
+DISCRETIONARY_STEPS = (0.2, 0.3)
+DISCRETIONARY_BUMPS = (0.0, 0.05, 0.1)
+# Total income (>=): <800, <1200, <1800, 1800+
+INCOME_STEPS = (800, 1200, 1800)
+INCOME_STRESS_BASES = (0.7, 0.5, 0.35, 0.2)
+# Spending/income ratio (>): up to 0.95, up to 1.0, above
+SPENDING_STRESS_STEPS = (0.95, 1.0)
+SPENDING_STRESS_BUMPS = (0.0, 0.1, 0.2)
+# Mock noise is drawn in blocks this size and handed out two per call
+MOCK_NOISE_SIZE = 8192
+
+
+def _one_hot_layout(pipeline) -> tuple[dict, int]:
+    """
+    Map each (feature, category) the pipeline's encoder learned to its column
+    in the transformed row, and return that row's width. Lets the joblib path
+    encode a row directly instead of going through pandas and the
+    ColumnTransformer.
+    """
+    categories = pipeline.named_steps["prep"].named_transformers_["cat"].categories_
+    slots = {}
+    for feature, feature_categories in zip(CATEGORICAL_FEATURES, categories):
+        for category in feature_categories:
+            slots[(feature, category)] = len(slots)
+    return slots, len(slots) + len(NUMERICAL_FEATURES)
+
+
+def _encode_rows(rows: list[tuple], layout: tuple[dict, int]) -> np.ndarray:
+    """One-hot the categorical part of each feature row and append the numbers."""
+    slots, width = layout
+    x = np.zeros((len(rows), width), dtype=np.float32)
+    for i, row in enumerate(rows):
+        for key in zip(CATEGORICAL_FEATURES, row):
+            slot = slots.get(key)
+            # Unseen categories stay all-zero, like handle_unknown="ignore"
+            if slot is not None:
+                x[i, slot] = 1.0
+        x[i, len(slots):] = row[len(CATEGORICAL_FEATURES):]
+    return x
+
+
+def _feature_row(ml_input: MLInput) -> tuple:
+    """Build the feature row in fixed column order."""
+    # Convert integer codes to string values expected by the model;
+    # out-of-range codes get the same defaults as before
+    gender = ml_input.gender
+    year = ml_input.year_in_school
+    major = ml_input.major
+    payment = ml_input.preferred_payment_method
+    return (
+        GENDER_NAMES[gender] if 0 <= gender < len(GENDER_NAMES) else "Male",
+        YEAR_NAMES[year] if 0 <= year < len(YEAR_NAMES) else "Freshman",
+        MAJOR_NAMES[major] if 0 <= major < len(MAJOR_NAMES) else "Economics",
+        PAYMENT_NAMES[payment] if 0 <= payment < len(PAYMENT_NAMES) else "Credit/Debit Card",
+        *_get_numerical(ml_input)
+    )
+
+
+def _to_output(stress_proba, overspending_raw: float) -> MLOutput:
+    """Turn one row of raw model outputs into probabilities."""
+    # Financial stress prediction (classification)
+    # Index 1 is probability of True (stressed)
+    financial_stress_prob = float(stress_proba[1]) if len(stress_proba) > 1 else float(stress_proba[0])
+
+    # Overspending prediction (regression)
+    # The model outputs a dollar amount (not a percentage)
+
+    # Convert dollar amount to probability using logistic sigmoid,
+    # clamped to reasonable bounds. Amounts past the precomputed cutoffs
+    # land on a bound anyway, so exp() only runs in between.
+    if overspending_raw <= OVERSPENDING_RAW_FLOOR:
+        overspending_prob = OVERSPENDING_PROB_FLOOR
+    elif overspending_raw >= OVERSPENDING_RAW_CAP:
+        overspending_prob = OVERSPENDING_PROB_CAP
+    else:
+        overspending_prob = 1 / (1 + math.exp(-overspending_raw / OVERSPENDING_SCALE))
+
+    return MLOutput(
+        overspending_prob=round(overspending_prob, 3),
+        financial_stress_prob=round(financial_stress_prob, 3)
+    )
 
 
 class SpendingRiskModelService:
@@ -34,17 +155,41 @@ class SpendingRiskModelService:
         self.endpoint = settings.ml_model_endpoint
         self._stress_model = None
         self._overspending_model = None
+        self._stress_session = None
+        self._overspending_session = None
+        self._stress_layout = None
+        self._overspending_layout = None
         self._models_loaded = False
+        # Set by start_batching(); until then each call runs on its own
+        self.max_batch = settings.ml_max_batch
+        self.batch_wait = settings.ml_batch_wait_ms / 1000
+        self._queue = None
+        self._batch_task = None
+        # Pre-drawn noise for _mock_predict
+        self._rng = np.random.default_rng()
+        self._noise = self._rng.uniform(-0.05, 0.05, size=MOCK_NOISE_SIZE)
+        self._noise_idx = 0
+        # Load up front so no request pays for unpickling or session setup
+        self._load_models()
 
     def _load_models(self):
         """Load the trained models from disk."""
-        if self._models_loaded:
+        # Prefer ONNX Runtime: single-row inference skips sklearn and pandas
+        if self._load_onnx_sessions():
             return
 
         if STRESS_MODEL_PATH.exists() and OVERSPENDING_MODEL_PATH.exists():
             try:
+                # joblib pulls in scikit-learn when unpickling; defer until first use
+                import joblib
                 self._stress_model = joblib.load(STRESS_MODEL_PATH)
                 self._overspending_model = joblib.load(OVERSPENDING_MODEL_PATH)
+                self._stress_layout = _one_hot_layout(self._stress_model)
+                self._overspending_layout = _one_hot_layout(self._overspending_model)
+                # Both pipelines are fit on the same columns; share one
+                # encoded row between them when their encoders agree
+                if self._overspending_layout == self._stress_layout:
+                    self._overspending_layout = self._stress_layout
                 self._models_loaded = True
                 print("ML models loaded successfully")
             except Exception as e:
@@ -54,72 +199,160 @@ class SpendingRiskModelService:
             print(f"Model files not found. Run 'python train_models.py' first.")
             self._models_loaded = False
 
+    def _load_onnx_sessions(self) -> bool:
+        """Open ONNX Runtime sessions for both models; False if unavailable."""
+        if not (STRESS_ONNX_PATH.exists() and OVERSPENDING_ONNX_PATH.exists()):
+            return False
+        try:
+            import onnxruntime as ort
+            providers = ["CPUExecutionProvider"]
+            # Inputs are a handful of rows, too small to pay for a thread
+            # pool handoff; run each model on the calling thread and don't
+            # leave idle workers spinning between requests.
+            opts = ort.SessionOptions()
+            opts.intra_op_num_threads = 1
+            opts.inter_op_num_threads = 1
+            opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            opts.add_session_config_entry("session.intra_op.allow_spinning", "0")
+            self._stress_session = ort.InferenceSession(
+                str(STRESS_ONNX_PATH), sess_options=opts, providers=providers
+            )
+            self._overspending_session = ort.InferenceSession(
+                str(OVERSPENDING_ONNX_PATH), sess_options=opts, providers=providers
+            )
+        except Exception as e:
+            print(f"Error loading ONNX models, falling back to joblib: {e}")
+            self._stress_session = None
+            self._overspending_session = None
+            return False
+        self._models_loaded = True
+        print("ML models loaded successfully (ONNX Runtime)")
+        return True
+
     async def predict(self, ml_input: MLInput) -> MLOutput:
         """
         Get risk predictions from the ML models.
         """
-        # Try to load models
-        self._load_models()
-
-        if self._models_loaded:
-            return self._predict_with_models(ml_input)
-        else:
+        if not self._models_loaded:
             # Fall back to mock predictions if models aren't available
             return self._mock_predict(ml_input)
 
-    def _predict_with_models(self, ml_input: MLInput) -> MLOutput:
-        """Use trained models for prediction."""
-        # Prepare input data as DataFrame
-        # Convert integer codes to string values expected by the model
-        data = {
-            "gender": [GENDER_MAP.get(ml_input.gender, "Male")],
-            "year_in_school": [YEAR_MAP.get(ml_input.year_in_school, "Freshman")],
-            "major": [MAJOR_MAP.get(ml_input.major, "Economics")],
-            "preferred_payment_method": [PAYMENT_MAP.get(ml_input.preferred_payment_method, "Credit/Debit Card")],
-            "age": [ml_input.age],
-            "monthly_income": [ml_input.monthly_income],
-            "financial_aid": [ml_input.financial_aid],
-            "tuition": [ml_input.tuition],
-            "housing": [ml_input.housing],
-            "food": [ml_input.food],
-            "transportation": [ml_input.transportation],
-            "books_supplies": [ml_input.books_supplies],
-            "entertainment": [ml_input.entertainment],
-            "personal_care": [ml_input.personal_care],
-            "technology": [ml_input.technology],
-            "health_wellness": [ml_input.health_wellness],
-            "miscellaneous": [ml_input.miscellaneous],
-        }
+        row = _feature_row(ml_input)
+        if self._queue is None:
+            # Tree inference is CPU-bound; keep it off the event loop
+            return (await asyncio.to_thread(self._predict_rows, [row]))[0]
 
-        df = pd.DataFrame(data)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, future))
+        return await future
 
-        # Financial stress prediction (classification)
-        # Get probability of stress (class 1)
-        stress_proba = self._stress_model.predict_proba(df)[0]
-        # Index 1 is probability of True (stressed)
-        financial_stress_prob = float(stress_proba[1]) if len(stress_proba) > 1 else float(stress_proba[0])
+    def start_batching(self) -> None:
+        """
+        Coalesce concurrent predict() calls into one model run per batch.
 
-        # Overspending prediction (regression)
-        # The model outputs a dollar amount (not a percentage)
-        overspending_raw = self._overspending_model.predict(df)[0]
+        Requests that arrive while a batch is running wait in a queue and
+        go out together in the next one, so the per-call overhead is paid
+        once per batch rather than once per request.
+        """
+        if self._models_loaded and self._batch_task is None:
+            self._queue = asyncio.Queue()
+            self._batch_task = asyncio.create_task(self._run_batches())
 
-        # Convert dollar amount to probability using logistic sigmoid
-        # Scale factor of 400 means more conservative estimates:
-        # - $0 overspending → ~50% probability
-        # - $200 overspending → ~62% probability
-        # - $400 overspending → ~73% probability
-        # - $800 overspending → ~88% probability
-        # - Negative values (underspending) → lower probabilities
-        scale_factor = 400.0
-        overspending_prob = 1 / (1 + math.exp(-overspending_raw / scale_factor))
+    async def stop_batching(self) -> None:
+        """Stop the batch worker and cancel anything still queued."""
+        if self._batch_task is None:
+            return
+        self._batch_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._batch_task
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+        self._batch_task = None
+        self._queue = None
 
-        # Clamp to reasonable bounds - cap at 85% to avoid overstating
-        overspending_prob = min(0.85, max(0.05, overspending_prob))
+    async def _run_batches(self) -> None:
+        """Take queued requests, up to max_batch at a time, and predict them together."""
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            if self.batch_wait > 0:
+                # Give concurrent callers a moment to join this batch
+                await asyncio.sleep(self.batch_wait)
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
 
-        return MLOutput(
-            overspending_prob=round(overspending_prob, 3),
-            financial_stress_prob=round(financial_stress_prob, 3)
+            try:
+                outputs = await asyncio.to_thread(self._predict_rows, [row for row, _ in batch])
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), output in zip(batch, outputs):
+                # Skip callers that gave up while the batch ran
+                if not future.done():
+                    future.set_result(output)
+
+    async def warmup(self) -> None:
+        """
+        Run one representative prediction so the first real request doesn't
+        pay for first-call setup (lazy imports, paging in the tree arrays).
+        """
+        await self.predict(MLInput(
+            age=20, gender=0, year_in_school=1, major=0,
+            monthly_income=1000, financial_aid=500, tuition=500, housing=600,
+            food=300, transportation=100, books_supplies=50, entertainment=100,
+            personal_care=50, technology=50, health_wellness=50,
+            miscellaneous=50, preferred_payment_method=1
+        ))
+
+    def _predict_rows(self, rows: list[tuple]) -> list[MLOutput]:
+        """Use trained models for prediction, one output per feature row."""
+        if self._stress_session is not None:
+            stress_proba, overspending_raw = self._run_onnx(rows)
+        else:
+            stress_proba, overspending_raw = self._run_sklearn(rows)
+        return [
+            _to_output(proba, float(raw))
+            for proba, raw in zip(stress_proba, overspending_raw)
+        ]
+
+    def _run_onnx(self, rows: list[tuple]):
+        """Stress class probabilities and raw overspending per row, via ONNX Runtime."""
+        # The exported graphs take one [N, 1] input per training column
+        columns = list(zip(*rows))
+        feeds = {
+            name: np.array(values, dtype=object).reshape(-1, 1)
+            for name, values in zip(CATEGORICAL_FEATURES, columns)
+        }
+        feeds.update(
+            (name, np.array(values, dtype=np.float32).reshape(-1, 1))
+            for name, values in zip(NUMERICAL_FEATURES, columns[len(CATEGORICAL_FEATURES):])
         )
+        # Outputs: classifier (label, probabilities), regressor (variable,)
+        stress_proba = self._stress_session.run(["probabilities"], feeds)[0]
+        overspending_raw = self._overspending_session.run(None, feeds)[0][:, 0]
+        return stress_proba, overspending_raw
+
+    def _run_sklearn(self, rows: list[tuple]):
+        """Stress class probabilities and raw overspending per row, via the joblib pipelines."""
+        # Encode once and call the fitted forests directly, skipping the
+        # per-request DataFrame and ColumnTransformer dispatch
+        x = _encode_rows(rows, self._stress_layout)
+        if self._overspending_layout is self._stress_layout:
+            x_overspending = x
+        else:
+            x_overspending = _encode_rows(rows, self._overspending_layout)
+        stress_proba = self._stress_model[-1].predict_proba(x)
+        overspending_raw = self._overspending_model[-1].predict(x_overspending)
+        return stress_proba, overspending_raw
 
     def _mock_predict(self, ml_input: MLInput) -> MLOutput:
         """
@@ -149,53 +382,36 @@ class SpendingRiskModelService:
             spending_ratio = total_spending / total_income
 
         # Overspending probability - more conservative estimates
-        if spending_ratio >= 1.3:
-            overspending_base = 0.7
-        elif spending_ratio >= 1.1:
-            overspending_base = 0.5
-        elif spending_ratio >= 1.0:
-            overspending_base = 0.35
-        elif spending_ratio >= 0.9:
-            overspending_base = 0.2
-        else:
-            overspending_base = 0.1
+        overspending_base = SPENDING_RATIO_BASES[bisect_right(SPENDING_RATIO_STEPS, spending_ratio)]
 
         # Adjust for discretionary spending ratio
         if total_income > 0:
             discretionary_ratio = discretionary / total_income
-            if discretionary_ratio > 0.3:
-                overspending_base = min(0.85, overspending_base + 0.1)
-            elif discretionary_ratio > 0.2:
-                overspending_base = min(0.85, overspending_base + 0.05)
+            overspending_base = min(0.85, overspending_base + DISCRETIONARY_BUMPS[
+                bisect_left(DISCRETIONARY_STEPS, discretionary_ratio)
+            ])
 
         # Financial stress probability
         # Based on income level, year in school, and spending patterns
-        if total_income < 800:
-            stress_base = 0.7
-        elif total_income < 1200:
-            stress_base = 0.5
-        elif total_income < 1800:
-            stress_base = 0.35
-        else:
-            stress_base = 0.2
+        stress_base = INCOME_STRESS_BASES[bisect_right(INCOME_STEPS, total_income)]
 
         # Adjust for spending ratio
-        if spending_ratio > 1.0:
-            stress_base = min(0.95, stress_base + 0.2)
-        elif spending_ratio > 0.95:
-            stress_base = min(0.95, stress_base + 0.1)
+        stress_base = min(0.95, stress_base + SPENDING_STRESS_BUMPS[
+            bisect_left(SPENDING_STRESS_STEPS, spending_ratio)
+        ])
 
         # Adjust for year in school (seniors/grad students often more stressed)
         if ml_input.year_in_school >= 3:
             stress_base = min(0.95, stress_base + 0.05)
 
         # Add small random variation
-        overspending_prob = max(0.05, min(0.95,
-            overspending_base + random.uniform(-0.05, 0.05)
-        ))
-        financial_stress_prob = max(0.05, min(0.95,
-            stress_base + random.uniform(-0.05, 0.05)
-        ))
+        if self._noise_idx + 2 > MOCK_NOISE_SIZE:
+            self._noise = self._rng.uniform(-0.05, 0.05, size=MOCK_NOISE_SIZE)
+            self._noise_idx = 0
+        overspending_noise, stress_noise = self._noise[self._noise_idx:self._noise_idx + 2].tolist()
+        self._noise_idx += 2
+        overspending_prob = max(0.05, min(0.95, overspending_base + overspending_noise))
+        financial_stress_prob = max(0.05, min(0.95, stress_base + stress_noise))
 
         return MLOutput(
             overspending_prob=round(overspending_prob, 3),
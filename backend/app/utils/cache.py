@@ -0,0 +1,95 @@
+"""
+Short-lived cache for rendered API responses.
+
+Uses Redis when REDIS_URL is configured so entries are shared between
+workers; otherwise falls back to an in-process LRU with expiry.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import orjson
+
+# How long parsed answers and generated summaries are reused
+CLAUDE_RESULT_TTL = 3600
+# Most entries the in-process fallback holds before evicting the oldest
+LOCAL_MAX_ENTRIES = 1024
+
+
+class ResponseCache:
+    """Async key/value store for serialized response bodies."""
+
+    def __init__(self, redis_url: str = ""):
+        self._redis = None
+        self._local: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        if redis_url:
+            from redis.asyncio import Redis
+            self._redis = Redis.from_url(redis_url)
+
+    @property
+    def shared(self) -> bool:
+        """Whether entries are visible to every worker (i.e. backed by Redis)."""
+        return self._redis is not None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return the cached body for key, or None if missing or expired."""
+        if self._redis is not None:
+            return await self._redis.get(key)
+
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._local.pop(key, None)
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, expire: int) -> None:
+        """Store value under key for expire seconds."""
+        if self._redis is not None:
+            await self._redis.set(key, value, ex=expire)
+            return
+
+        self._local[key] = (time.monotonic() + expire, value)
+        self._local.move_to_end(key)
+        # Evict least recently used entries so memory stays bounded
+        while len(self._local) > LOCAL_MAX_ENTRIES:
+            self._local.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        """Invalidate key."""
+        if self._redis is not None:
+            await self._redis.delete(key)
+            return
+        self._local.pop(key, None)
+
+    async def close(self) -> None:
+        """Release the Redis connection pool, if any."""
+        if self._redis is not None:
+            await self._redis.aclose()
+
+
+def dashboard_key(user_id) -> str:
+    """Cache key for a user's dashboard response."""
+    return f"dashboard:{user_id}"
+
+
+def _digest(payload) -> str:
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def parser_key(raw_answers) -> str:
+    """Cache key for parsed answers, insensitive to order, case and padding."""
+    return "parser:" + _digest(sorted(
+        (a.question_id, a.answer.strip().lower()) for a in raw_answers
+    ))
+
+
+def summary_key(snapshot_data: dict, ml_output, analytics) -> str:
+    """Cache key for a summary of the given snapshot fields, risk and analytics."""
+    return "summary:" + _digest(
+        [snapshot_data, ml_output.model_dump(), analytics.model_dump()]
+    )
@@ -0,0 +1,46 @@
+from fastapi import Request
+
+from ..services import (
+    ClaudeParserService,
+    ClaudeSummarizerService,
+    ClaudeSurveyService,
+    ClaudeTeacherService,
+    SpendingRiskModelService,
+    AnalyticsService
+)
+from .cache import ResponseCache
+
+
+def get_parser_service(request: Request) -> ClaudeParserService:
+    """Get the shared parser service."""
+    return request.app.state.parser
+
+
+def get_summarizer_service(request: Request) -> ClaudeSummarizerService:
+    """Get the shared summarizer service."""
+    return request.app.state.summarizer
+
+
+def get_ml_service(request: Request) -> SpendingRiskModelService:
+    """Get the shared ML model service."""
+    return request.app.state.ml
+
+
+def get_analytics_service(request: Request) -> AnalyticsService:
+    """Get the shared analytics service."""
+    return request.app.state.analytics
+
+
+def get_survey_service(request: Request) -> ClaudeSurveyService:
+    """Get the shared survey service."""
+    return request.app.state.survey
+
+
+def get_teacher_service(request: Request) -> ClaudeTeacherService:
+    """Get the shared teacher service."""
+    return request.app.state.teacher
+
+
+def get_response_cache(request: Request) -> ResponseCache:
+    """Get the shared response cache."""
+    return request.app.state.cache
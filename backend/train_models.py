@@ -2,6 +2,7 @@
 Script to train and save models. Run to generate model files.
 """
 
+import numpy as np
 import pandas as pd
 import joblib
 from sklearn.model_selection import train_test_split
@@ -9,6 +10,9 @@ from sklearn.preprocessing import OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.metrics import mean_squared_error, roc_auc_score
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType, StringTensorType
 import os
 
 # Create models directory
@@ -26,8 +30,52 @@ numerical = [
     "personal_care", "technology", "health_wellness", "miscellaneous"
 ]
 
+# The service feeds the models float32, so train on the same precision
+df[numerical] = df[numerical].astype(np.float32)
 X = df[categorical + numerical]
 
+# Trees kept in each saved forest after pruning
+STRESS_KEEP_TREES = 200
+OVERSPENDING_KEEP_TREES = 200
+
+
+def export_onnx(model, path, options=None):
+    """Save a fitted pipeline as ONNX, one [None, 1] input per feature column."""
+    initial_types = (
+        [(name, StringTensorType([None, 1])) for name in categorical]
+        + [(name, FloatTensorType([None, 1])) for name in numerical]
+    )
+    onx = convert_sklearn(model, initial_types=initial_types, options=options, target_opset=17)
+    with open(path, "wb") as f:
+        f.write(onx.SerializeToString())
+
+
+def prune_forest(forest, X_fit, y_fit, keep, score_tree):
+    """Keep the `keep` trees with the lowest out-of-bag error.
+
+    Each tree is scored only on the training rows its bootstrap sample left
+    out, so the test split stays untouched for the before/after check.
+    """
+    y_fit = np.asarray(y_fit)
+    errors = []
+    for tree, sample in zip(forest.estimators_, forest.estimators_samples_):
+        oob = np.ones(len(y_fit), dtype=bool)
+        oob[sample] = False
+        errors.append(score_tree(tree, X_fit[oob], y_fit[oob]))
+    best = np.sort(np.argsort(errors)[:keep])
+    forest.estimators_ = [forest.estimators_[i] for i in best]
+    forest.n_estimators = len(forest.estimators_)
+    return forest
+
+
+# One encoder for both models. It only learns the category vocabulary, so
+# it is fit once on the feature columns and shared: both saved pipelines
+# then encode a row identically and the service can encode it once.
+preprocess = ColumnTransformer([
+    ("cat", OneHotEncoder(handle_unknown="ignore", dtype=np.float32), categorical),
+    ("num", "passthrough", numerical)
+]).fit(X)
+
 # =====================
 # FINANCIAL STRESS MODEL (Classification)
 # =====================
@@ -35,30 +83,39 @@ print("Training Financial Stress Classification Model...")
 
 y_stress = df["financial_stress"]
 
-preprocess_clf = ColumnTransformer([
-    ("cat", OneHotEncoder(handle_unknown="ignore"), categorical),
-    ("num", "passthrough", numerical)
-])
-
-stress_model = Pipeline([
-    ("prep", preprocess_clf),
-    ("clf", RandomForestClassifier(
-        n_estimators=400,
-        class_weight="balanced",
-        random_state=42
-    ))
-])
-
 X_train, X_test, y_train, y_test = train_test_split(
     X, y_stress, test_size=0.2, random_state=42, stratify=y_stress
 )
 
-stress_model.fit(X_train, y_train)
+A_train, A_test = preprocess.transform(X_train), preprocess.transform(X_test)
+stress_clf = RandomForestClassifier(
+    n_estimators=400,
+    class_weight="balanced",
+    random_state=42
+).fit(A_train, y_train)
+
+auc_full = roc_auc_score(y_test, stress_clf.predict_proba(A_test)[:, 1])
+prune_forest(
+    stress_clf, A_train, y_train, STRESS_KEEP_TREES,
+    lambda tree, A, y: np.mean((tree.predict_proba(A)[:, 1] - y) ** 2)
+)
+auc_pruned = roc_auc_score(y_test, stress_clf.predict_proba(A_test)[:, 1])
+print(f"Test ROC AUC: {auc_full:.4f} with 400 trees, {auc_pruned:.4f} with {STRESS_KEEP_TREES}")
+
+stress_model = Pipeline([("prep", preprocess), ("clf", stress_clf)])
 
 # Save the model
 joblib.dump(stress_model, "app/ml_models/financial_stress_model.joblib")
 print("Financial Stress model saved to app/ml_models/financial_stress_model.joblib")
 
+# ONNX copy for serving; without ZipMap the probabilities come out as a plain array
+export_onnx(
+    stress_model,
+    "app/ml_models/financial_stress_model.onnx",
+    options={id(stress_model.named_steps["clf"]): {"zipmap": False}}
+)
+print("Financial Stress model exported to app/ml_models/financial_stress_model.onnx")
+
 # =====================
 # OVERSPENDING MODEL (Regression)
 # =====================
@@ -66,33 +123,37 @@ print("\nTraining Overspending Regression Model...")
 
 y_overspending = df["overspending"]
 
-preprocess_reg = ColumnTransformer([
-    ("cat", OneHotEncoder(handle_unknown="ignore"), categorical),
-    ("num", "passthrough", numerical)
-])
-
-overspending_model = Pipeline([
-    ("prep", preprocess_reg),
-    ("rf", RandomForestRegressor(
-        n_estimators=935,
-        random_state=42,
-        max_depth=18,
-        max_features='sqrt',
-        min_samples_leaf=2,
-        min_samples_split=6
-    ))
-])
-
 X_train, X_test, y_train, y_test = train_test_split(
     X, y_overspending, test_size=0.2, random_state=42
 )
 
-overspending_model.fit(X_train, y_train)
+A_train, A_test = preprocess.transform(X_train), preprocess.transform(X_test)
+overspending_rf = RandomForestRegressor(
+    n_estimators=935,
+    random_state=42,
+    max_depth=18,
+    max_features='sqrt',
+    min_samples_leaf=2,
+    min_samples_split=6
+).fit(A_train, y_train)
+
+rmse_full = mean_squared_error(y_test, overspending_rf.predict(A_test)) ** 0.5
+prune_forest(
+    overspending_rf, A_train, y_train, OVERSPENDING_KEEP_TREES,
+    lambda tree, A, y: np.mean((tree.predict(A) - y) ** 2)
+)
+rmse_pruned = mean_squared_error(y_test, overspending_rf.predict(A_test)) ** 0.5
+print(f"Test RMSE: {rmse_full:.2f} with 935 trees, {rmse_pruned:.2f} with {OVERSPENDING_KEEP_TREES}")
+
+overspending_model = Pipeline([("prep", preprocess), ("rf", overspending_rf)])
 
 # Save the model
 joblib.dump(overspending_model, "app/ml_models/overspending_model.joblib")
 print("Overspending model saved to app/ml_models/overspending_model.joblib")
 
+export_onnx(overspending_model, "app/ml_models/overspending_model.onnx")
+print("Overspending model exported to app/ml_models/overspending_model.onnx")
+
 # Save feature names for reference
 feature_info = {
     "categorical": categorical,